@@ -1,26 +1,114 @@
 """Advanced AI system for Circular Economy Platform - Industry Grade."""
 
-import base64
+import asyncio
+import binascii
+import hashlib
+import sys
 import time
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Coroutine, Dict, Final, List, Optional, Set
 
 import httpx
-from openai import OpenAI
 
-from database import formatted_product_data
-from env import OPENAI_API_KEY, TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN
+from ai_batch import openai_client, submit, submit_batched
+from database import get_formatted_product_data
 from cache_system import cache
 from conversation_memory import memory
 from quick_responses import get_quick_response, handle_special_command
-from intent_detector import analyze_message
+from intent_detector import MessageAnalysis, analyze
 from input_validator import normalize_quantity
 from business_metrics import metrics
-from utils import logger
+from utils import logger, normalize_message
+from wsp import twilio_http
 
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
+# Max approximate tokens of conversation history sent to OpenAI
+HISTORY_TOKEN_BUDGET = 2048
 
-def get_response(
+
+# Raw bytes per base64 chunk (multiple of 3 so chunks concatenate without padding)
+_B64_CHUNK = 3 * 64 * 1024
+
+
+async def aclose_clients():
+    """Close pooled HTTP clients (called on application shutdown)."""
+    await openai_client.close()
+
+
+# Prompt fragments by user type (interned, built once)
+_USER_TYPE_CTX: Final[Dict[str, str]] = {
+    "provider": sys.intern("""El usuario es un PROVEEDOR (reciclador, familia, organización).
+
+Enfoque:
+- Mostrar cómo vender directo a empresas
+- Destacar eliminación de intermediarios (+30% más ganancia)
+- Explicar proceso simple de registro
+- Ofrecer análisis de material con IA (si envía foto)
+- Mencionar apoyo municipal y pagos seguros"""),
+
+    "buyer": sys.intern("""El usuario es un COMPRADOR (empresa industrial, fabricante).
+
+Enfoque:
+- Mostrar disponibilidad de materiales
+- Destacar reducción de costos (hasta 40%)
+- Explicar calidad verificada con IA
+- Ofrecer trazabilidad completa
+- Mencionar cumplimiento de metas ESG"""),
+
+    "unknown": sys.intern("""Tipo de usuario AÚN NO IDENTIFICADO.
+
+Tarea prioritaria:
+- Hacer preguntas para identificar si es proveedor o comprador
+- Ej: "¿Tienes materiales para vender o estás buscando comprar?"
+- Ser amigable y educativo sobre la plataforma"""),
+}
+
+_NEXT_STEPS: Final[Dict[str, str]] = {
+    "provider": sys.intern("""
+🚀 **Próximos Pasos para Vender:**
+1. Confirma cantidad disponible
+2. Te conectamos con compradores interesados
+3. Negociación directa (sin intermediarios)
+4. Pago seguro al entregar
+
+¿Cuánto material tienes disponible?"""),
+
+    "buyer": sys.intern("""
+🚀 **Próximos Pasos para Comprar:**
+1. Confirma cantidad que necesitas
+2. Verificamos disponibilidad en tu zona
+3. Conectamos con proveedores
+4. Coordinamos entrega
+
+¿Cuántas toneladas necesitas?"""),
+
+    "unknown": sys.intern("""
+¿Tienes este material para **vender** o estás buscando **comprar**?"""),
+}
+
+
+def _fit_history(context: List[Dict[str, str]], budget: int = HISTORY_TOKEN_BUDGET) -> List[Dict[str, str]]:
+    """Keep the newest messages whose approximate token count fits the budget."""
+    costs = [len(msg["content"]) // 4 + 4 for msg in context]
+    if sum(costs) <= budget:
+        return context
+    
+    kept = 0
+    used = 0
+    for cost in reversed(costs):
+        if used + cost > budget:
+            break
+        used += cost
+        kept += 1
+    return context[len(context) - kept:]
+
+
+# Quick-dispatch lookups are pure functions of the normalized text
+_quick_response_cached = lru_cache(maxsize=4096)(get_quick_response)
+_special_command_cached = lru_cache(maxsize=4096)(handle_special_command)
+
+
+async def get_response(
     user_message: str,
     phone: str = "unknown",
     system_message: Optional[str] = None,
@@ -33,65 +121,92 @@ def get_response(
     - Duplicate detection
     - Business metrics tracking
     """
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
+    norm = normalize_message(user_message)  # Normalized once, shared by every lookup below
     
-    # 0. Analyze message (intents, sentiment, materials, quantities)
-    analysis = analyze_message(user_message)
-    intents = analysis['intents']
-    materials = analysis['materials']
-    quantities = analysis['quantities']
-    corrected_text = analysis['corrected']
-    
-    # Show autocorrections if any
-    if analysis['corrections']:
-        corrections_msg = ", ".join(analysis['corrections'])
-        logger.info(f"Autocorrected: {corrections_msg} for {phone}")
-    
-    # Check for duplicate message
-    if memory.is_duplicate_message(phone, user_message):
-        context = memory.get_context(phone)
+    # 0. Check for duplicate message
+    if memory.is_duplicate_message(phone, user_message, norm):
+        context = await memory.aget_context(phone)
         if len(context) >= 2:
             last_response = context[-1]['content'] if context[-1]['role'] == 'assistant' else None
             if last_response:
                 return f"Ya te respondí hace un momento:\n\n{last_response}\n\n¿Necesitas algo más?"
     
-    # Track materials in cart
-    for material in materials:
-        memory.add_material_to_cart(phone, material)
+    # Fetch the user profile once for the whole request
+    user_profile = await memory.aget_user_profile(phone)
+    
+    quick = _respond_quick(user_message, norm, phone, user_profile)
+    if quick is not None:
+        return quick
+    return await _respond_llm(user_message, norm, phone, user_profile, system_message, start_ns)
+
+
+def _respond_quick(user_message: str, norm: str, phone: str, user_profile: Dict[str, Any]) -> Optional[str]:
+    """Answer special commands, quick responses and cached replies (no NLP, no AI)."""
+    user_type = user_profile['type']
     
     # 1. Handle special commands first
-    special_response = handle_special_command(corrected_text)
+    special_response = _special_command_cached(norm)
     if special_response:
-        logger.info(f"Special command handled: {corrected_text} for {phone}")
-        metrics.track_message(phone, memory.get_user_profile(phone)['type'], intents)
+        logger.info(f"Special command handled: {norm} for {phone}")
+        metrics.track_message(phone, user_type, [])
         return special_response
     
     # 2. Check quick responses (instant, no AI needed)
-    quick_response = get_quick_response(corrected_text)
+    quick_response = _quick_response_cached(norm)
     if quick_response:
-        logger.info(f"Quick response used for: {corrected_text[:50]}... (phone: {phone})")
-        memory.add_message(phone, "user", corrected_text)
+        logger.info(f"Quick response used for: {user_message[:50]}... (phone: {phone})")
+        memory.add_message(phone, "user", user_message)
         memory.add_message(phone, "assistant", quick_response)
-        metrics.track_message(phone, memory.get_user_profile(phone)['type'], intents)
+        metrics.track_message(phone, user_type, [])
         return quick_response
     
     # 3. Check cache (for AI responses)
-    cached_response = cache.get(corrected_text)
+    cached_response = cache.get_normalized(norm)
     if cached_response:
-        logger.info(f"Cache hit for: {corrected_text[:50]}... (phone: {phone})")
-        memory.add_message(phone, "user", corrected_text)
+        logger.info(f"Cache hit for: {user_message[:50]}... (phone: {phone})")
+        memory.add_message(phone, "user", user_message)
         memory.add_message(phone, "assistant", cached_response)
-        metrics.track_message(phone, memory.get_user_profile(phone)['type'], intents)
+        metrics.track_message(phone, user_type, [])
         
         # Add contextual suggestion
-        suggestion = memory.get_contextual_suggestion(phone)
+        suggestion = memory.get_contextual_suggestion(phone, user_profile)
         if suggestion:
             return f"{cached_response}\n\n{suggestion}"
         return cached_response
     
-    # 4. Get conversation context
-    context = memory.get_context(phone, max_messages=10)
-    user_profile = memory.get_user_profile(phone)
+    return None
+
+
+async def _respond_llm(
+    user_message: str,
+    norm: str,
+    phone: str,
+    user_profile: Dict[str, Any],
+    system_message: Optional[str],
+    start_ns: int,
+) -> Optional[str]:
+    """Full path: analyze the message, build the prompt and call OpenAI."""
+    user_type = user_profile['type']
+    
+    # 4. Analyze message only when headed to OpenAI (intents, sentiment, materials, quantities)
+    analysis = analyze(user_message)
+    intents = list(analysis.intents)
+    materials = list(analysis.materials)
+    quantities = analysis.quantities
+    corrected_text = analysis.corrected
+    
+    # Show autocorrections if any
+    if analysis.corrections:
+        corrections_msg = ", ".join(analysis.corrections)
+        logger.info(f"Autocorrected: {corrections_msg} for {phone}")
+    
+    # Track materials in cart
+    for material in materials:
+        memory.add_material_to_cart(phone, material)
+    
+    # 5. Get conversation context
+    history = await memory.aget_openai_messages(phone)
     
     # Track material inquiry
     if materials:
@@ -101,65 +216,59 @@ def get_response(
     normalized_qty = None
     if quantities:
         qty = quantities[0]
-        normalized_qty = normalize_quantity(qty['value'], qty['unit'])
+        normalized_qty = normalize_quantity(qty.value, qty.unit)
     
-    is_hot = metrics.is_hot_lead(normalized_qty, len(context), intents)
+    is_hot = metrics.is_hot_lead(normalized_qty, len(history), intents)
     if is_hot:
         memory.set_priority(phone, 'high')
-        metrics.track_lead(phone, user_profile['type'], materials, normalized_qty, is_hot=True)
+        metrics.track_lead(phone, user_type, materials, normalized_qty, is_hot=True)
         logger.info(f"🔥 HOT LEAD detected: {phone} - {materials} - {normalized_qty}")
     
     # Check if should escalate to human
     should_escalate = metrics.should_escalate_to_human(
         phone, 
-        len(context), 
-        analysis['sentiment']['urgent']
+        len(history), 
+        analysis.sentiment.urgent
     )
     if should_escalate:
         logger.info(f"⚠️ Escalating to human: {phone}")
     
-    # 5. Build system message if not provided
+    # 6. Build system message if not provided (only shared prompts are batchable)
+    batchable = system_message is None
     if system_message is None:
         system_message = build_system_message(user_profile, analysis)
     
-    # 6. Prepare messages for OpenAI
-    messages = [{"role": "system", "content": system_message}]
-    
-    # Add conversation history
-    for msg in context:
-        messages.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
+    # 7. Prepare messages for OpenAI: stored history is already in message
+    # format, trimmed to the newest turns within the token budget
+    messages = [
+        {"role": "system", "content": system_message},
+        *_fit_history(history),
+        {"role": "user", "content": user_message},
+    ]
     
-    # Add current message
-    messages.append({
-        "role": "user",
-        "content": user_message
-    })
-    
-    # 7. Call OpenAI with retry logic
+    # 8. Call OpenAI through the micro-batcher / rate-limited request pool
     try:
-        response_text = call_openai_with_retry(messages)
+        if batchable:
+            response_text = await submit_batched(phone, messages, 500)
+        else:
+            response_text = await submit(messages, 500)
         
-        # 8. Save to memory and cache
+        # 9. Save to memory (inline: the contextual suggestion reads it)
         memory.add_message(phone, "user", corrected_text)
         memory.add_message(phone, "assistant", response_text)
-        cache.set(corrected_text, response_text)
         
-        # 9. Track metrics
-        duration = time.time() - start_time
-        metrics.track_message(phone, user_profile['type'], intents)
-        metrics.track_response_time(duration)
+        # 10. Cache and track metrics off the request path
+        duration_ms = (time.perf_counter_ns() - start_ns) / 1e6
+        _spawn(_persist(norm, response_text, phone, user_type, intents, duration_ms / 1000))
         
         logger.info(
             f"AI response generated for {phone} "
-            f"(type: {user_profile['type']}, duration: {duration:.2f}s, "
+            f"(type: {user_type}, duration: {duration_ms:.1f}ms, "
             f"intents: {intents})"
         )
         
-        # 10. Add contextual suggestion
-        suggestion = memory.get_contextual_suggestion(phone)
+        # 11. Add contextual suggestion
+        suggestion = memory.get_contextual_suggestion(phone, user_profile)
         if suggestion:
             response_text = f"{response_text}\n\n{suggestion}"
         
@@ -170,56 +279,22 @@ def get_response(
         return "⚠️ Disculpa, ocurrió un error temporal. ¿Puedes repetir tu consulta?"
 
 
-def call_openai_with_retry(messages: List[Dict[str, Any]]) -> str:
-    """Call OpenAI API with automatic retry on failures."""
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            completion = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,  # type: ignore
-                temperature=0.7,
-                max_tokens=500,
-            )
-            return completion.choices[0].message.content or ""
-            
-        except Exception as e:
-            if attempt < max_retries - 1:
-                logger.warning(f"OpenAI retry attempt {attempt + 1}: {str(e)}")
-                time.sleep(2 ** attempt)  # Exponential backoff
-            else:
-                logger.error(f"OpenAI failed after {max_retries} attempts: {str(e)}")
-                raise
-    
-    return ""  # Fallback (nunca debería llegar aquí)
+# Intent guidance appended to the system prompt, by priority
+INTENT_GUIDANCE = {
+    'precio': "\n🎯 Usuario pregunta por PRECIOS. Sé específico con valores de catálogo.",
+    'stock': "\n🎯 Usuario pregunta por STOCK. Menciona cantidades disponibles.",
+    'proceso': "\n🎯 Usuario pregunta CÓMO FUNCIONA. Explica paso a paso.",
+    'urgente': "\n🚨 URGENTE: Usuario tiene prisa. Responde directo y ofrece contacto inmediato.",
+}
 
 
-def build_system_message(user_profile: Dict[str, Any], analysis: Optional[Dict[str, Any]] = None) -> str:
-    """Build dynamic system message based on user profile and message analysis."""
-    
-    user_type = user_profile.get('type', 'unknown')
-    
-    # Add intent-specific guidance
-    intent_guidance = ""
-    if analysis and analysis.get('intents'):
-        intents = analysis['intents']
-        if 'precio' in intents:
-            intent_guidance = "\n🎯 Usuario pregunta por PRECIOS. Sé específico con valores de catálogo."
-        elif 'stock' in intents:
-            intent_guidance = "\n🎯 Usuario pregunta por STOCK. Menciona cantidades disponibles."
-        elif 'proceso' in intents:
-            intent_guidance = "\n🎯 Usuario pregunta CÓMO FUNCIONA. Explica paso a paso."
-        elif 'urgente' in intents or (analysis.get('sentiment', {}).get('urgent')):
-            intent_guidance = "\n🚨 URGENTE: Usuario tiene prisa. Responde directo y ofrece contacto inmediato."
-    
-    base_message = f"""Eres un asistente inteligente de una plataforma de economía circular que conecta proveedores de materiales reciclables con compradores industriales en Perú y LATAM.
+def _render_static() -> str:
+    """Render the user-independent part of the chat system prompt."""
+    return """Eres un asistente inteligente de una plataforma de economía circular que conecta proveedores de materiales reciclables con compradores industriales en Perú y LATAM.
 
 🎯 MISIÓN PRINCIPAL:
 Eliminar intermediarios especuladores, promover comercio justo, y fomentar sostenibilidad ambiental.
 
-👤 PERFIL DEL USUARIO: {user_type.upper()}
-{get_user_type_context(user_type)}{intent_guidance}
-
 📊 CONTEXTO DEL MERCADO:
 - Más de 1,100,000 toneladas/año de reciclables en Perú
 - Mercado de $170 millones con oportunidades globales de $100 mil millones
@@ -234,7 +309,7 @@ Eliminar intermediarios especuladores, promover comercio justo, y fomentar soste
 - +10 distritos con alianzas municipales
 - 0% especulación garantizada
 
-{formatted_product_data}
+""" + get_formatted_product_data() + """
 
 🗣️ ESTILO DE COMUNICACIÓN:
 - SÉ HUMANO: conversacional, empático, profesional
@@ -268,61 +343,97 @@ RECUERDA: Cada conversación es una oportunidad para:
 - Reducir la huella de carbono de una empresa
 - Construir una economía más circular y justa"""
 
-    return base_message
+
+def _intent_key(analysis: Optional[MessageAnalysis]) -> str:
+    """Pick the intent that drives the prompt guidance ('' if none)."""
+    if not analysis or not analysis.intents:
+        return ''
+    intents = list(analysis.intents)
+    for key in ('precio', 'stock', 'proceso'):
+        if key in intents:
+            return key
+    if 'urgente' in intents or analysis.sentiment.urgent:
+        return 'urgente'
+    return ''
+
+
+@lru_cache(maxsize=16)
+def _dynamic_tail(user_type: str, intent_key: str) -> str:
+    """Per-user suffix of the system prompt (profile and intent guidance)."""
+    return (
+        f"\n\n👤 PERFIL DEL USUARIO: {user_type.upper()}\n"
+        f"{get_user_type_context(user_type)}{INTENT_GUIDANCE.get(intent_key, '')}"
+    )
+
+
+def build_system_message(user_profile: Dict[str, Any], analysis: Optional[MessageAnalysis] = None) -> str:
+    """Build system message: stable cached prefix first, short per-user tail last."""
+    user_type = user_profile.get('type', 'unknown')
+    return _STATIC_SYSTEM_PREFIX + _dynamic_tail(user_type, _intent_key(analysis))
 
 
 def get_user_type_context(user_type: str) -> str:
     """Get context text based on user type."""
-    contexts = {
-        "provider": """El usuario es un PROVEEDOR (reciclador, familia, organización).
-        
-Enfoque:
-- Mostrar cómo vender directo a empresas
-- Destacar eliminación de intermediarios (+30% más ganancia)
-- Explicar proceso simple de registro
-- Ofrecer análisis de material con IA (si envía foto)
-- Mencionar apoyo municipal y pagos seguros""",
-        
-        "buyer": """El usuario es un COMPRADOR (empresa industrial, fabricante).
-        
-Enfoque:
-- Mostrar disponibilidad de materiales
-- Destacar reducción de costos (hasta 40%)
-- Explicar calidad verificada con IA
-- Ofrecer trazabilidad completa
-- Mencionar cumplimiento de metas ESG""",
-        
-        "unknown": """Tipo de usuario AÚN NO IDENTIFICADO.
-        
-Tarea prioritaria:
-- Hacer preguntas para identificar si es proveedor o comprador
-- Ej: "¿Tienes materiales para vender o estás buscando comprar?"
-- Ser amigable y educativo sobre la plataforma"""
-    }
-    
-    return contexts.get(user_type, contexts["unknown"])
+    return _USER_TYPE_CTX.get(user_type, _USER_TYPE_CTX["unknown"])
 
 
-def identify_image(user_message: str, product_image_url: str, phone: str = "unknown") -> Optional[str]:
+# Strong references to fire-and-forget tasks so they aren't garbage collected
+_background_tasks: Set["asyncio.Task[None]"] = set()
+
+
+def _spawn(coro: Coroutine[Any, Any, None]):
+    """Run a coroutine in the background, keeping a reference until it ends."""
+    task = asyncio.get_running_loop().create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _persist(
+    norm: str,
+    response_text: str,
+    phone: str,
+    user_type: str,
+    intents: List[str],
+    duration_seconds: float,
+):
+    """Write cache and metrics for a generated response off the request path."""
+    try:
+        await asyncio.to_thread(cache.set_normalized, norm, response_text)
+        metrics.track_message(phone, user_type, intents)
+        metrics.track_response_time(duration_seconds)
+    except Exception as e:
+        logger.error(f"Background persistence failed for {phone}: {str(e)}")
+
+
+async def _persist_image(image_cache_key: str, result: str, phone: str):
+    """Write an image analysis to the cache off the request path."""
+    try:
+        await asyncio.to_thread(cache.set, image_cache_key, result)
+    except Exception as e:
+        logger.error(f"Background persistence failed for {phone}: {str(e)}")
+
+
+def _to_data_url(data: bytes, content_type: str) -> str:
+    """Encode bytes as a base64 data URL, streaming into a single buffer."""
+    buf = bytearray(f"data:{content_type};base64,".encode("ascii"))
+    view = memoryview(data)
+    for i in range(0, len(view), _B64_CHUNK):
+        buf += binascii.b2a_base64(view[i:i + _B64_CHUNK], newline=False)
+    return buf.decode("ascii")
+
+
+async def identify_image(user_message: str, product_image_url: str, phone: str = "unknown") -> Optional[str]:
     """
     Analyze recyclable material images with AI Vision.
     Identifies material type, quality, estimated weight, and fair price.
     """
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
     
     # Download image from Twilio
     try:
-        auth = (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        response = httpx.get(
-            product_image_url,
-            auth=auth,
-            timeout=30.0,
-            follow_redirects=True
-        )
+        response = await twilio_http.get(product_image_url, follow_redirects=True)
         response.raise_for_status()
         
-        # Convert to base64
-        image_data = base64.b64encode(response.content).decode("utf-8")
         content_type = response.headers.get("content-type", "image/jpeg")
         
         # Validate image type
@@ -330,8 +441,6 @@ def identify_image(user_message: str, product_image_url: str, phone: str = "unkn
             logger.warning(f"Invalid image type: {content_type}")
             return "⚠️ Formato de imagen no válido. Por favor envía JPG, PNG o WEBP."
         
-        image_url_data = f"data:{content_type};base64,{image_data}"
-        
     except httpx.HTTPStatusError as e:
         logger.error(f"HTTP error downloading image for {phone}: {e.response.status_code}")
         return "⚠️ No pude descargar la imagen. Por favor, intenta enviarla de nuevo."
@@ -340,12 +449,65 @@ def identify_image(user_message: str, product_image_url: str, phone: str = "unkn
         return "⚠️ Error al descargar la imagen. ¿Puedes intentar enviarla de nuevo?"
     
     # Get user profile for context
-    user_profile = memory.get_user_profile(phone)
+    user_profile = await memory.aget_user_profile(phone)
+    
+    # Identical photo (and caption) already analyzed for this user type?
+    image_hash = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+    image_cache_key = f"img:{image_hash}:{user_profile['type']}:{normalize_message(user_message)}"
+    cached_result = cache.get(image_cache_key)
+    if cached_result:
+        logger.info(f"Image cache hit for {phone} ({image_hash})")
+        memory.add_message(phone, "user", f"[Imagen enviada: {user_message}]")
+        memory.add_message(phone, "assistant", cached_result)
+        return cached_result
+    
+    # Convert to base64 data URL
+    image_url_data = _to_data_url(response.content, content_type)
+    del response
+    
+    # Build vision system message (static prefix + per-user tail)
+    system_message = _STATIC_VISION_PREFIX + _vision_tail(user_profile.get('type', 'unknown'))
     
-    # Build vision system message
-    system_message = f"""Eres un experto en identificación de materiales reciclables con IA.
+    # Call OpenAI Vision
+    try:
+        messages = [
+            {"role": "system", "content": system_message},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": user_message or "Analiza este material reciclable"},
+                    {"type": "image_url", "image_url": {"url": image_url_data, "detail": "auto"}}
+                ]
+            }
+        ]
+        
+        result = await submit(messages, 500)
+        
+        if not result:
+            return "⚠️ No pude analizar la imagen. Por favor, intenta con otra foto."
+        
+        # Log analytics
+        duration_ms = (time.perf_counter_ns() - start_ns) / 1e6
+        logger.info(
+            f"✅ Image analysis completed for {phone} "
+            f"(type: {user_profile['type']}, duration: {duration_ms:.1f}ms)"
+        )
+        
+        # Save to memory; cache off the request path
+        memory.add_message(phone, "user", f"[Imagen enviada: {user_message}]")
+        memory.add_message(phone, "assistant", result)
+        _spawn(_persist_image(image_cache_key, result, phone))
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"❌ Image analysis failed for {phone}: {str(e)}")
+        return "⚠️ Error al analizar la imagen. ¿Puedes intentar con otra foto más clara?"
+
 
-USUARIO: {user_profile.get('type', 'unknown').upper()}
+def _render_static_vision() -> str:
+    """Render the user-independent part of the vision system prompt."""
+    return """Eres un experto en identificación de materiales reciclables con IA.
 
 TU TAREA:
 Analiza la imagen y proporciona:
@@ -355,7 +517,7 @@ Analiza la imagen y proporciona:
 4. Precio justo según nuestro catálogo
 5. Recomendaciones para el usuario
 
-{formatted_product_data}
+""" + get_formatted_product_data() + """
 
 FORMATO DE RESPUESTA:
 
@@ -373,81 +535,28 @@ FORMATO DE RESPUESTA:
 • [Consejo específico 1]
 • [Consejo específico 2]
 
-{get_next_steps_for_user_type(user_profile.get('type', 'unknown'))}
-
 IMPORTANTE:
 - Si NO es reciclable: indica claramente
 - Si calidad es mala: sé honesto pero constructivo
 - Siempre da el precio justo (revisa catálogo arriba)
 - Termina con pregunta o acción clara
 - Sé breve y preciso (máximo 200 palabras)"""
-    
-    # Call OpenAI Vision
-    try:
-        messages = [
-            {"role": "system", "content": system_message},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": user_message or "Analiza este material reciclable"},
-                    {"type": "image_url", "image_url": {"url": image_url_data, "detail": "auto"}}
-                ]
-            }
-        ]
-        
-        completion = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,  # type: ignore
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        result = completion.choices[0].message.content
-        
-        if not result:
-            return "⚠️ No pude analizar la imagen. Por favor, intenta con otra foto."
-        
-        # Log analytics
-        duration = time.time() - start_time
-        logger.info(
-            f"✅ Image analysis completed for {phone} "
-            f"(type: {user_profile['type']}, duration: {duration:.2f}s)"
-        )
-        
-        # Save to memory
-        memory.add_message(phone, "user", f"[Imagen enviada: {user_message}]")
-        memory.add_message(phone, "assistant", result)
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"❌ Image analysis failed for {phone}: {str(e)}")
-        return "⚠️ Error al analizar la imagen. ¿Puedes intentar con otra foto más clara?"
+
+
+@lru_cache(maxsize=8)
+def _vision_tail(user_type: str) -> str:
+    """Per-user suffix of the vision prompt (user type and closing steps)."""
+    return (
+        f"\n\nUSUARIO: {user_type.upper()}\n\n"
+        f"CIERRE DE LA RESPUESTA (agrégalo al final):{get_next_steps_for_user_type(user_type)}"
+    )
 
 
 def get_next_steps_for_user_type(user_type: str) -> str:
     """Get contextual next steps based on user type."""
-    steps = {
-        "provider": """
-🚀 **Próximos Pasos para Vender:**
-1. Confirma cantidad disponible
-2. Te conectamos con compradores interesados
-3. Negociación directa (sin intermediarios)
-4. Pago seguro al entregar
+    return _NEXT_STEPS.get(user_type, _NEXT_STEPS["unknown"])
 
-¿Cuánto material tienes disponible?""",
-        
-        "buyer": """
-🚀 **Próximos Pasos para Comprar:**
-1. Confirma cantidad que necesitas
-2. Verificamos disponibilidad en tu zona
-3. Conectamos con proveedores
-4. Coordinamos entrega
 
-¿Cuántas toneladas necesitas?""",
-        
-        "unknown": """
-¿Tienes este material para **vender** o estás buscando **comprar**?"""
-    }
-    
-    return steps.get(user_type, steps["unknown"])
+# Prompt prefixes rendered once so every request shares a cacheable prefix
+_STATIC_SYSTEM_PREFIX = _render_static()
+_STATIC_VISION_PREFIX = _render_static_vision()
@@ -1,6 +1,7 @@
 """Advanced AI system for circular economy platform - Industry-level conversational AI."""
 
 import base64
+import re
 from typing import TYPE_CHECKING, Optional
 import httpx
 from openai import OpenAI
@@ -338,23 +339,30 @@ IMPORTANTE:
         return f"⚠️ Error al analizar la imagen con IA.\n\nPuedes describir el material que tienes y te ayudo igual.\n\nError técnico: {str(e)[:100]}"
 
 
+# Material interest keywords, compiled once into one alternation per category
+MATERIAL_KEYWORDS = {
+    "plástico": ["pet", "hdpe", "ldpe", "pp", "plástico", "botella", "envase"],
+    "metal": ["aluminio", "cobre", "acero", "bronce", "metal", "chatarra"],
+    "papel": ["papel", "periódico", "archivo", "documento"],
+    "cartón": ["cartón", "caja", "empaque"],
+    "vidrio": ["vidrio", "botella de vidrio", "cristal"],
+    "especial": ["tetrapak", "batería", "electrónico"]
+}
+
+_MATERIAL_PATTERNS = {
+    category: re.compile("|".join(map(re.escape, keywords)))
+    for category, keywords in MATERIAL_KEYWORDS.items()
+}
+
+
 def extract_and_update_interests(phone: str, user_message: str, bot_response: str):
     """Extract material interests from conversation and update profile."""
-    material_keywords = {
-        "plástico": ["pet", "hdpe", "ldpe", "pp", "plástico", "botella", "envase"],
-        "metal": ["aluminio", "cobre", "acero", "bronce", "metal", "chatarra"],
-        "papel": ["papel", "periódico", "archivo", "documento"],
-        "cartón": ["cartón", "caja", "empaque"],
-        "vidrio": ["vidrio", "botella de vidrio", "cristal"],
-        "especial": ["tetrapak", "batería", "electrónico"]
-    }
-    
-    interests = []
     combined_text = (user_message + " " + bot_response).lower()
     
-    for category, keywords in material_keywords.items():
-        if any(kw in combined_text for kw in keywords):
-            interests.append(category)
+    interests = [
+        category for category, pattern in _MATERIAL_PATTERNS.items()
+        if pattern.search(combined_text)
+    ]
     
     if interests:
         update_user_profile(phone, interests=interests)
@@ -1,16 +1,253 @@
 """Procesamiento de mensajes de audio de WhatsApp."""
 
-import base64
+import asyncio
 import logging
-from typing import Dict, Optional, Any
+import os
+import tempfile
+import wave
+from functools import lru_cache
+from io import BytesIO
+from typing import IO, Any, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import parse_qs, urlparse
 
-import httpx
-from openai import OpenAI
+from ai_batch import openai_client
+from env import (
+    WHISPER_BACKEND,
+    WHISPER_COMPUTE_TYPE,
+    WHISPER_DEVICE,
+    WHISPER_LOCAL_MODEL,
+)
+from wsp import twilio_http
 
-from env import OPENAI_API_KEY, TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN
+# Recorte de silencio con VAD (opcional: poetry install -E vad)
+try:
+    import av
+    import webrtcvad
+except ImportError:  # pragma: no cover - dependencias opcionales
+    av = None
+    webrtcvad = None
+
+# Whisper local con CTranslate2 (opcional: poetry install -E local-whisper)
+try:
+    from faster_whisper import BatchedInferencePipeline, WhisperModel
+except ImportError:  # pragma: no cover - dependencia opcional
+    BatchedInferencePipeline = None
+    WhisperModel = None
 
 logger = logging.getLogger(__name__)
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+
+USE_LOCAL_WHISPER = WHISPER_BACKEND == 'local' and WhisperModel is not None
+if WHISPER_BACKEND == 'local' and not USE_LOCAL_WHISPER:
+    logger.warning("WHISPER_BACKEND=local but faster-whisper is not installed; using the OpenAI API")
+
+# Micro-batching de Whisper: ventana de espera, tamaño de lote y concurrencia
+WHISPER_BATCH_WINDOW = 0.05
+WHISPER_MAX_BATCH = 8
+WHISPER_MAX_CONCURRENT = 5
+
+# Audios descargados se mantienen en memoria hasta este tamaño, luego van a disco
+AUDIO_SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+# Extensión (o subtipo MIME) -> nombre de archivo que Whisper usa para detectar el formato
+_EXT_TO_NAME = {
+    '.ogg': 'audio.ogg',
+    '.opus': 'audio.opus',
+    '.mp3': 'audio.mp3',
+    '.mpeg': 'audio.mp3',
+    '.m4a': 'audio.m4a',
+    '.wav': 'audio.wav',
+}
+_DEFAULT_AUDIO_NAME = 'audio.ogg'  # WhatsApp usa .ogg por defecto
+
+
+def _audio_filename(audio_url: str) -> str:
+    """Nombre de archivo según la extensión de la URL (o su MediaContentType)."""
+    parsed = urlparse(audio_url)
+    ext = os.path.splitext(parsed.path)[1].lower()
+    if ext not in _EXT_TO_NAME and 'MediaContentType' in parsed.query:
+        content_type = parse_qs(parsed.query).get('MediaContentType', [''])[0]
+        ext = '.' + content_type.rpartition('/')[2].split(';')[0].strip().lower()
+    return _EXT_TO_NAME.get(ext, _DEFAULT_AUDIO_NAME)
+
+
+# VAD: PCM 16 kHz mono, tramas de 20 ms; se conserva un margen alrededor de la voz
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 20
+VAD_FRAME_BYTES = VAD_SAMPLE_RATE * VAD_FRAME_MS // 1000 * 2
+VAD_AGGRESSIVENESS = 2
+VAD_PADDING_FRAMES = 10  # 200 ms
+VAD_MIN_TRIM_FRAMES = 50  # solo re-subir si se recorta al menos 1 s
+
+
+def _decode_pcm(audio: IO[bytes]) -> bytes:
+    """Decodifica el audio a PCM s16 16 kHz mono."""
+    resampler = av.AudioResampler(format='s16', layout='mono', rate=VAD_SAMPLE_RATE)
+    pcm = bytearray()
+    with av.open(audio) as container:
+        for frame in container.decode(audio=0):
+            for out in resampler.resample(frame):
+                pcm += bytes(out.planes[0])[:out.samples * 2]
+        for out in resampler.resample(None):
+            pcm += bytes(out.planes[0])[:out.samples * 2]
+    return bytes(pcm)
+
+
+def _trim_silence(audio: IO[bytes]) -> Optional[IO[bytes]]:
+    """
+    Recorta el silencio inicial/final con webrtcvad.
+    
+    Returns:
+        WAV recortado, o None si no hay VAD instalado o no vale la pena recortar
+    """
+    if av is None or webrtcvad is None:
+        return None
+    try:
+        audio.seek(0)
+        pcm = _decode_pcm(audio)
+    except Exception as e:
+        logger.warning(f"VAD decode failed, uploading original audio: {e}")
+        return None
+    finally:
+        audio.seek(0)
+    
+    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    total = len(pcm) // VAD_FRAME_BYTES
+    speech = [
+        i for i in range(total)
+        if vad.is_speech(pcm[i * VAD_FRAME_BYTES:(i + 1) * VAD_FRAME_BYTES], VAD_SAMPLE_RATE)
+    ]
+    if not speech:
+        return None
+    first = max(speech[0] - VAD_PADDING_FRAMES, 0)
+    last = min(speech[-1] + 1 + VAD_PADDING_FRAMES, total)
+    if total - (last - first) < VAD_MIN_TRIM_FRAMES:
+        return None
+    
+    trimmed = tempfile.SpooledTemporaryFile(max_size=AUDIO_SPOOL_MAX_SIZE)
+    with wave.open(trimmed, 'wb') as wav:  # type: ignore[arg-type]
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(VAD_SAMPLE_RATE)
+        wav.writeframes(pcm[first * VAD_FRAME_BYTES:last * VAD_FRAME_BYTES])
+    trimmed.seek(0)
+    logger.info(f"VAD trimmed audio from {total * VAD_FRAME_MS} ms to {(last - first) * VAD_FRAME_MS} ms")
+    return trimmed  # type: ignore
+
+
+AudioInput = Union[bytes, IO[bytes]]
+PendingAudio = Tuple[AudioInput, str, "asyncio.Future[Any]"]
+
+
+# Lote interno del pipeline local (segmentos de 30 s procesados juntos)
+LOCAL_WHISPER_BATCH_SIZE = 8
+
+
+@lru_cache(maxsize=1)
+def _local_pipeline() -> Any:
+    """Carga el modelo faster-whisper una sola vez (cuantizado según WHISPER_COMPUTE_TYPE)."""
+    model = WhisperModel(WHISPER_LOCAL_MODEL, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE)
+    logger.info(f"Loaded faster-whisper '{WHISPER_LOCAL_MODEL}' ({WHISPER_DEVICE}, {WHISPER_COMPUTE_TYPE})")
+    return BatchedInferencePipeline(model=model)
+
+
+def _transcribe_local(audio: AudioInput) -> str:
+    """Transcribe en el propio servidor con faster-whisper (bloqueante)."""
+    source = BytesIO(audio) if isinstance(audio, bytes) else audio
+    segments, _ = _local_pipeline().transcribe(
+        source,
+        language="es",
+        beam_size=1,
+        batch_size=LOCAL_WHISPER_BATCH_SIZE,
+    )
+    return " ".join(segment.text.strip() for segment in segments)
+
+
+async def _create_transcription(audio: AudioInput, filename: str) -> Any:
+    """Llama a Whisper con bytes o un archivo abierto (sin copias intermedias)."""
+    if not isinstance(audio, bytes):
+        audio.seek(0)
+    if USE_LOCAL_WHISPER:
+        return await asyncio.to_thread(_transcribe_local, audio)
+    return await openai_client.audio.transcriptions.create(
+        model="whisper-1",
+        file=(filename, audio),
+        language="es",  # Español
+        response_format="text"
+    )
+
+
+class WhisperBatcher:
+    """Agrupa audios concurrentes y los transcribe en paralelo con concurrencia acotada."""
+    
+    def __init__(
+        self,
+        window: float = WHISPER_BATCH_WINDOW,
+        max_batch: int = WHISPER_MAX_BATCH,
+        max_concurrent: int = WHISPER_MAX_CONCURRENT,
+    ):
+        self.window = window
+        self.max_batch = max_batch
+        self.max_concurrent = max_concurrent
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[PendingAudio]"] = None
+        self._tasks: Set["asyncio.Task[Any]"] = set()
+    
+    def _ensure_started(self) -> "asyncio.Queue[PendingAudio]":
+        """Arranca el drenador en el loop actual (reinicia si cambió el loop)."""
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._tasks = set()
+            # El semáforo pertenece al drenador de este loop
+            self._spawn(self._drain(self._queue, asyncio.Semaphore(self.max_concurrent)))
+        return self._queue
+    
+    def _spawn(self, coro: Any):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def submit(self, audio: AudioInput, filename: str) -> Any:
+        """Encola un audio y espera su transcripción."""
+        queue = self._ensure_started()
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        await queue.put((audio, filename, future))
+        return await future
+    
+    async def _drain(self, queue: "asyncio.Queue[PendingAudio]", semaphore: asyncio.Semaphore):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[PendingAudio] = [await queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            logger.info(f"Dispatching Whisper batch of {len(batch)} audio(s)")
+            for item in batch:
+                self._spawn(self._transcribe(item, semaphore))
+    
+    async def _transcribe(self, item: PendingAudio, semaphore: asyncio.Semaphore):
+        audio, filename, future = item
+        if future.done():
+            return
+        async with semaphore:
+            try:
+                result = await _create_transcription(audio, filename)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+
+
+whisper_batcher = WhisperBatcher()
 
 
 class AudioProcessor:
@@ -19,60 +256,47 @@ class AudioProcessor:
     def __init__(self):
         self.supported_formats = ['.ogg', '.opus', '.mp3', '.m4a', '.wav']
     
-    def download_audio(self, audio_url: str) -> Optional[bytes]:
+    async def download_audio(self, audio_url: str) -> Optional[IO[bytes]]:
         """
-        Descarga el archivo de audio desde Twilio.
+        Descarga el archivo de audio desde Twilio por streaming.
         
         Args:
             audio_url: URL del archivo de audio de Twilio
         
         Returns:
-            bytes del archivo de audio o None si falla
+            archivo temporal (en memoria hasta AUDIO_SPOOL_MAX_SIZE) o None si falla
         """
+        audio_file = tempfile.SpooledTemporaryFile(max_size=AUDIO_SPOOL_MAX_SIZE)
         try:
-            auth_str = f"{TWILIO_ACCOUNT_SID}:{TWILIO_AUTH_TOKEN}"
-            auth_bytes = auth_str.encode('utf-8')
-            auth_b64 = base64.b64encode(auth_bytes).decode('utf-8')
-            
-            headers = {
-                'Authorization': f'Basic {auth_b64}'
-            }
-            
             # Seguir redirects (Twilio usa 307 para redirigir a CloudFront)
-            response = httpx.get(audio_url, headers=headers, timeout=30.0, follow_redirects=True)
-            response.raise_for_status()
+            async with twilio_http.stream('GET', audio_url, follow_redirects=True) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    audio_file.write(chunk)
             
-            logger.info(f"Audio downloaded successfully: {len(response.content)} bytes")
-            return response.content
+            logger.info(f"Audio downloaded successfully: {audio_file.tell()} bytes")
+            audio_file.seek(0)
+            return audio_file  # type: ignore
             
         except Exception as e:
+            audio_file.close()
             logger.error(f"Error downloading audio: {str(e)}")
             return None
     
-    def transcribe_audio(self, audio_bytes: bytes, filename: str = "audio.ogg") -> Optional[str]:
+    async def transcribe_audio(self, audio: AudioInput, filename: str = "audio.ogg") -> Optional[str]:
         """
         Transcribe audio usando OpenAI Whisper API.
         
         Args:
-            audio_bytes: bytes del archivo de audio
+            audio: bytes o archivo abierto con el audio
             filename: nombre del archivo (para determinar formato)
         
         Returns:
             Texto transcrito o None si falla
         """
         try:
-            # Crear archivo temporal en memoria
-            from io import BytesIO
-            audio_file = BytesIO(audio_bytes)
-            audio_file.name = filename
-            
-            # Transcribir con Whisper
-            transcript = openai_client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                language="es",  # Español
-                response_format="text"
-            )
+            # Transcribir con Whisper (agrupado con otros audios concurrentes)
+            transcript = await whisper_batcher.submit(audio, filename)
             
             transcribed_text = transcript.strip() if isinstance(transcript, str) else transcript.text.strip()
             
@@ -83,7 +307,7 @@ class AudioProcessor:
             logger.error(f"Error transcribing audio: {str(e)}")
             return None
     
-    def process_audio_message(self, audio_url: str) -> Optional[str]:
+    async def process_audio_message(self, audio_url: str) -> Optional[str]:
         """
         Procesa un mensaje de audio completo: descarga y transcribe.
         
@@ -96,22 +320,22 @@ class AudioProcessor:
         logger.info(f"Processing audio message from: {audio_url}")
         
         # Descargar audio
-        audio_bytes = self.download_audio(audio_url)
-        if not audio_bytes:
+        audio_file = await self.download_audio(audio_url)
+        if audio_file is None:
             return None
         
         # Determinar formato
-        filename = "audio.ogg"  # WhatsApp usa .ogg por defecto
-        if 'MediaContentType' in audio_url:
-            if 'opus' in audio_url.lower():
-                filename = "audio.opus"
-            elif 'mp3' in audio_url.lower():
-                filename = "audio.mp3"
-            elif 'm4a' in audio_url.lower():
-                filename = "audio.m4a"
-        
-        # Transcribir
-        transcribed_text = self.transcribe_audio(audio_bytes, filename)
+        filename = _audio_filename(audio_url)
+        
+        # Quitar silencio inicial/final (si hay VAD instalado)
+        trimmed = await asyncio.to_thread(_trim_silence, audio_file)
+        if trimmed is not None:
+            audio_file.close()
+            audio_file, filename = trimmed, 'audio.wav'
+        
+        # Transcribir (el archivo temporal se libera al terminar)
+        with audio_file:
+            transcribed_text = await self.transcribe_audio(audio_file, filename)
         
         return transcribed_text
     
@@ -124,7 +348,7 @@ class AudioProcessor:
         """
         from intent_detector import analyze_message
         
-        # Usar el analizador existente
+        # Usar el analizador existente (memoizado: transcripciones repetidas son comunes)
         analysis = analyze_message(transcribed_text)
         
         # Agregar flag de que vino de audio
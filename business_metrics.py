@@ -1,9 +1,93 @@
 """Business metrics tracking and analytics."""
 
-import json
+import atexit
+import queue
+import sqlite3
+import statistics
+import threading
+from collections import Counter, deque
 from datetime import datetime
+from functools import wraps
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+import orjson
+
+# Seconds the writer waits after the first change so a burst is flushed together
+FLUSH_INTERVAL = 2.0
+
+# Rolling windows of timing samples kept in memory
+MAX_RESPONSE_TIMES = 1000
+MAX_TRANSACTION_TIMES = 500
+
+# Scalar counters persisted by name; dict counters use "<prefix>:<key>"
+SCALAR_COUNTERS = ('total_conversations', 'total_messages', 'providers_count', 'buyers_count', 'unknown_count')
+COUNTER_PREFIXES = {'funnel': 'conversion_funnel', 'material': 'materials_consulted', 'intent': 'intents_detected'}
+HISTOGRAMS = {'response_times': MAX_RESPONSE_TIMES, 'transaction_times': MAX_TRANSACTION_TIMES}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS histograms (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, value REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS histograms_name ON histograms (name, id);
+CREATE TABLE IF NOT EXISTS hot_leads (phone TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS leads (
+    phone TEXT PRIMARY KEY,
+    user_type TEXT,
+    materials TEXT,
+    quantity TEXT,
+    is_hot INTEGER NOT NULL DEFAULT 0,
+    status TEXT,
+    timestamp TEXT,
+    closed_at TEXT
+);
+"""
+
+UPSERT_COUNTER = """
+INSERT INTO counters (name, value) VALUES (?, ?)
+ON CONFLICT(name) DO UPDATE SET value = excluded.value
+"""
+
+UPSERT_LEAD = """
+INSERT INTO leads (phone, user_type, materials, quantity, is_hot, status, timestamp, closed_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(phone) DO UPDATE SET
+    user_type = excluded.user_type, materials = excluded.materials, quantity = excluded.quantity,
+    is_hot = excluded.is_hot, status = excluded.status, timestamp = excluded.timestamp,
+    closed_at = excluded.closed_at
+"""
+
+TRIM_HISTOGRAM = """
+DELETE FROM histograms WHERE name = ? AND id <= (
+    SELECT id FROM histograms WHERE name = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+)
+"""
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+
+def _lead_row(lead: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Flatten a lead dict into a leads table row (JSON columns as text)."""
+    return (
+        lead['phone'],
+        lead.get('user_type'),
+        orjson.dumps(lead.get('materials') or []).decode(),
+        orjson.dumps(lead.get('quantity')).decode(),
+        int(bool(lead.get('is_hot'))),
+        lead.get('status'),
+        lead.get('timestamp'),
+        lead.get('closed_at'),
+    )
+
+
+def _locked(method: F) -> F:
+    """Run a mutating method under the instance lock and wake the writer thread."""
+    @wraps(method)
+    def wrapper(self: 'BusinessMetrics', *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            result = method(self, *args, **kwargs)
+        self._write_q.put_nowait(True)
+        return result
+    return wrapper  # type: ignore
 
 
 class BusinessMetrics:
@@ -14,21 +98,110 @@ class BusinessMetrics:
         self.storage_dir.mkdir(exist_ok=True)
         self.metrics_file = self.storage_dir / "business_metrics.json"
         self.leads_file = self.storage_dir / "leads.json"
-        
-        # Load existing metrics
-        self.metrics = self._load_metrics()
-        self.leads = self._load_leads()
+        self.db_file = self.storage_dir / "business_metrics.db"
+        
+        # Write-back state: track_* record what changed, the writer upserts just that
+        self._dirty_counters: Set[str] = set()
+        self._dirty_leads: Set[str] = set()
+        self._new_hot_leads: List[str] = []
+        self._new_samples: List[Tuple[str, float]] = []
+        
+        # SQLite in WAL mode: small row upserts instead of whole-file rewrites
+        self._db = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        
+        # Load existing metrics (one-time migration from the old JSON files)
+        if self._db.execute("SELECT 1 FROM counters LIMIT 1").fetchone():
+            self.metrics = self._load_metrics_db()
+            self.leads = self._load_leads_db()
+        else:
+            self.metrics = self._load_metrics()
+            self.leads = self._load_leads()
+            self._mark_all_dirty()
+        
+        # O(1) lookups: leads by phone and hot-lead membership
+        self._leads_by_phone: Dict[str, Dict[str, Any]] = {}
+        for lead in self.leads:
+            self._leads_by_phone.setdefault(lead['phone'], lead)
+        self._hot_leads = set(self.metrics.setdefault('hot_leads', []))
+        
+        # Running sums so averages are O(1) (deque lengths give the counts)
+        self._rt_sum: float = sum(self.metrics['response_times'])
+        self._tt_sum: float = sum(self.metrics['transaction_times'])
+        
+        # Write-back: track_* mark data dirty and enqueue a wake-up; a daemon writer
+        # thread owns all disk I/O, so request handlers never wait on fsync
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._write_q: "queue.Queue[Optional[bool]]" = queue.Queue()
+        if self._dirty_counters or self._dirty_leads or self._new_samples:
+            self._write_q.put_nowait(True)  # Persist the JSON migration
+        self._writer = threading.Thread(target=self._writer_loop, name="metrics-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+    
+    def _load_metrics_db(self) -> Dict[str, Any]:
+        """Load metrics from the SQLite store."""
+        data = self._initialize_metrics()
+        for name, value in self._db.execute("SELECT name, value FROM counters"):
+            prefix, _, key = name.partition(':')
+            if key and prefix in COUNTER_PREFIXES:
+                data[COUNTER_PREFIXES[prefix]][key] = value
+            elif name in SCALAR_COUNTERS:
+                data[name] = value
+        
+        for name, maxlen in HISTOGRAMS.items():
+            rows = self._db.execute(
+                "SELECT value FROM histograms WHERE name = ? ORDER BY id DESC LIMIT ?", (name, maxlen)
+            ).fetchall()
+            data[name].extend(value for (value,) in reversed(rows))
+        
+        data['hot_leads'] = [phone for (phone,) in self._db.execute("SELECT phone FROM hot_leads ORDER BY rowid")]
+        return data
+    
+    def _load_leads_db(self) -> List[Dict[str, Any]]:
+        """Load leads from the SQLite store."""
+        leads: List[Dict[str, Any]] = []
+        rows = self._db.execute(
+            "SELECT phone, user_type, materials, quantity, is_hot, status, timestamp, closed_at "
+            "FROM leads ORDER BY rowid"
+        )
+        for phone, user_type, materials, quantity, is_hot, status, timestamp, closed_at in rows:
+            lead = {
+                'phone': phone,
+                'user_type': user_type,
+                'materials': orjson.loads(materials),
+                'quantity': orjson.loads(quantity),
+                'is_hot': bool(is_hot),
+                'timestamp': timestamp,
+                'status': status
+            }
+            if closed_at is not None:
+                lead['closed_at'] = closed_at
+            leads.append(lead)
+        return leads
     
     def _load_metrics(self) -> Dict[str, Any]:
-        """Load metrics from disk."""
+        """Load metrics from the legacy JSON file."""
         if not self.metrics_file.exists():
             return self._initialize_metrics()
         
         try:
-            with open(self.metrics_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            data = orjson.loads(self.metrics_file.read_bytes())
         except Exception:
             return self._initialize_metrics()
+        
+        # Older files may lack newer keys; the migration persists every counter
+        data = {**self._initialize_metrics(), **data}
+        # Counters make per-key increments a single operation
+        data['materials_consulted'] = Counter(data.get('materials_consulted', {}))
+        data['intents_detected'] = Counter(data.get('intents_detected', {}))
+        data['response_times'] = deque(data.get('response_times', []), maxlen=MAX_RESPONSE_TIMES)
+        data['transaction_times'] = deque(data.get('transaction_times', []), maxlen=MAX_TRANSACTION_TIMES)
+        return data
     
     def _initialize_metrics(self) -> Dict[str, Any]:
         """Initialize empty metrics structure."""
@@ -38,78 +211,162 @@ class BusinessMetrics:
             'providers_count': 0,
             'buyers_count': 0,
             'unknown_count': 0,
-            'materials_consulted': {},
-            'intents_detected': {},
+            'materials_consulted': Counter(),
+            'intents_detected': Counter(),
             'hot_leads': [],
             'conversion_funnel': {
                 'inquiry': 0,
                 'negotiation': 0,
                 'closed': 0
             },
-            'response_times': [],
-            'transaction_times': [],
+            'response_times': deque(maxlen=MAX_RESPONSE_TIMES),
+            'transaction_times': deque(maxlen=MAX_TRANSACTION_TIMES),
             'last_updated': datetime.now().isoformat()
         }
     
     def _load_leads(self) -> List[Dict[str, Any]]:
-        """Load leads from disk."""
+        """Load leads from the legacy JSON file."""
         if not self.leads_file.exists():
             return []
         
         try:
-            with open(self.leads_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return orjson.loads(self.leads_file.read_bytes())
         except Exception:
             return []
     
-    def _save_metrics(self):
-        """Save metrics to disk."""
-        self.metrics['last_updated'] = datetime.now().isoformat()
-        with open(self.metrics_file, 'w', encoding='utf-8') as f:
-            json.dump(self.metrics, f, ensure_ascii=False, indent=2)
+    def _mark_all_dirty(self):
+        """Queue every counter, sample and lead for the next flush (JSON migration)."""
+        self._dirty_counters.update(SCALAR_COUNTERS)
+        for prefix, key in COUNTER_PREFIXES.items():
+            self._dirty_counters.update(f"{prefix}:{name}" for name in self.metrics[key])
+        for name in HISTOGRAMS:
+            self._new_samples.extend((name, value) for value in self.metrics[name])
+        self._new_hot_leads.extend(self.metrics['hot_leads'])
+        self._dirty_leads.update(lead['phone'] for lead in self.leads)
+    
+    def _save_counters(self, *names: str):
+        """Mark counters for the next background flush."""
+        self._dirty_counters.update(names)
+    
+    def _save_lead(self, phone: str):
+        """Mark a lead for the next background flush."""
+        self._dirty_leads.add(phone)
+    
+    def _counter_value(self, name: str) -> int:
+        prefix, _, key = name.partition(':')
+        if key:
+            return self.metrics[COUNTER_PREFIXES[prefix]][key]
+        return self.metrics[name]
     
-    def _save_leads(self):
-        """Save leads to disk."""
-        with open(self.leads_file, 'w', encoding='utf-8') as f:
-            json.dump(self.leads, f, ensure_ascii=False, indent=2)
+    def _drain_write_queue(self) -> bool:
+        """Discard queued wake-ups (one flush covers them all); True if told to stop."""
+        stop = False
+        while True:
+            try:
+                item = self._write_q.get_nowait()
+            except queue.Empty:
+                return stop
+            stop |= item is None
+            self._write_q.task_done()
     
+    def _writer_loop(self):
+        while True:
+            item = self._write_q.get()
+            self._write_q.task_done()
+            if item is None:
+                return
+            # Let the burst accumulate, then coalesce its wake-ups into one flush
+            self._stop.wait(FLUSH_INTERVAL)
+            stop = self._drain_write_queue()
+            try:
+                self.flush()
+            except Exception:
+                self._write_q.put_nowait(True)  # Data stays dirty; retry after the next wait
+            if stop:
+                return
+    
+    def flush(self):
+        """Upsert everything that changed since the last flush in one transaction."""
+        with self._write_lock:
+            with self._lock:
+                counters = [(name, self._counter_value(name)) for name in self._dirty_counters]
+                leads = [_lead_row(self._leads_by_phone[phone]) for phone in self._dirty_leads]
+                samples, hot_leads = self._new_samples, self._new_hot_leads
+                self._dirty_counters, self._dirty_leads = set(), set()
+                self._new_samples, self._new_hot_leads = [], []
+                if counters or samples:
+                    self.metrics['last_updated'] = datetime.now().isoformat()
+            
+            if not (counters or leads or samples or hot_leads):
+                return
+            try:
+                with self._db:
+                    self._db.executemany(UPSERT_COUNTER, counters)
+                    self._db.executemany(UPSERT_LEAD, leads)
+                    self._db.executemany("INSERT OR IGNORE INTO hot_leads (phone) VALUES (?)", [(p,) for p in hot_leads])
+                    self._db.executemany("INSERT INTO histograms (name, value) VALUES (?, ?)", samples)
+                    for name in {name for name, _ in samples}:
+                        self._db.execute(TRIM_HISTOGRAM, (name, name, HISTOGRAMS[name]))
+            except Exception:
+                # Keep the changes pending so the next flush retries
+                with self._lock:
+                    self._dirty_counters.update(name for name, _ in counters)
+                    self._dirty_leads.update(row[0] for row in leads)
+                    self._new_samples[:0] = samples
+                    self._new_hot_leads[:0] = hot_leads
+                raise
+    
+    def close(self):
+        """Stop the writer thread, write any pending changes and close the database."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._write_q.put_nowait(None)
+        self._writer.join(timeout=FLUSH_INTERVAL)
+        try:
+            self.flush()
+        finally:
+            with self._write_lock:
+                self._db.close()
+    
+    @_locked
     def track_message(self, phone: str, user_type: str, intents: List[str]):
         """Track a new message."""
         self.metrics['total_messages'] += 1
         
         # Track intents
         for intent in intents:
-            if intent not in self.metrics['intents_detected']:
-                self.metrics['intents_detected'][intent] = 0
             self.metrics['intents_detected'][intent] += 1
         
-        self._save_metrics()
+        self._save_counters('total_messages', *(f"intent:{intent}" for intent in intents))
     
+    @_locked
     def track_conversation_start(self, phone: str, user_type: str):
         """Track new conversation."""
         self.metrics['total_conversations'] += 1
         
         if user_type == 'provider':
-            self.metrics['providers_count'] += 1
+            type_counter = 'providers_count'
         elif user_type == 'buyer':
-            self.metrics['buyers_count'] += 1
+            type_counter = 'buyers_count'
         else:
-            self.metrics['unknown_count'] += 1
+            type_counter = 'unknown_count'
+        self.metrics[type_counter] += 1
         
-        self._save_metrics()
+        self._save_counters('total_conversations', type_counter)
     
+    @_locked
     def track_material_inquiry(self, phone: str, materials: List[str]):
         """Track material consultation."""
         for material in materials:
-            if material not in self.metrics['materials_consulted']:
-                self.metrics['materials_consulted'][material] = 0
             self.metrics['materials_consulted'][material] += 1
         
         # Update conversion funnel
         self.metrics['conversion_funnel']['inquiry'] += 1
         
-        self._save_metrics()
+        self._save_counters('funnel:inquiry', *(f"material:{material}" for material in materials))
     
+    @_locked
     def track_lead(self, phone: str, user_type: str, materials: List[str], 
                    quantity: Optional[Dict[str, Any]] = None, 
                    is_hot: bool = False):
@@ -125,77 +382,76 @@ class BusinessMetrics:
         }
         
         # Check if lead already exists
-        existing_lead = next((l for l in self.leads if l['phone'] == phone), None)
+        existing_lead = self._leads_by_phone.get(phone)
         if existing_lead:
             # Update existing lead
             existing_lead.update(lead)
         else:
             self.leads.append(lead)
+            self._leads_by_phone[phone] = lead
         
         # Track hot lead
-        if is_hot and phone not in self.metrics['hot_leads']:
+        if is_hot and phone not in self._hot_leads:
+            self._hot_leads.add(phone)
             self.metrics['hot_leads'].append(phone)
+            self._new_hot_leads.append(phone)
         
-        self._save_leads()
-        self._save_metrics()
+        self._save_lead(phone)
     
+    @_locked
     def track_negotiation(self, phone: str):
         """Track when user enters negotiation phase."""
         self.metrics['conversion_funnel']['negotiation'] += 1
         
         # Update lead status
-        lead = next((l for l in self.leads if l['phone'] == phone), None)
+        lead = self._leads_by_phone.get(phone)
         if lead:
             lead['status'] = 'negotiating'
-            self._save_leads()
+            self._save_lead(phone)
         
-        self._save_metrics()
+        self._save_counters('funnel:negotiation')
     
+    @_locked
     def track_close(self, phone: str, success: bool = True):
         """Track closed deal."""
         self.metrics['conversion_funnel']['closed'] += 1
         
         # Update lead status
-        lead = next((l for l in self.leads if l['phone'] == phone), None)
+        lead = self._leads_by_phone.get(phone)
         if lead:
             lead['status'] = 'closed' if success else 'lost'
             lead['closed_at'] = datetime.now().isoformat()
-            self._save_leads()
+            self._save_lead(phone)
         
-        self._save_metrics()
+        self._save_counters('funnel:closed')
     
+    @_locked
     def track_response_time(self, duration_seconds: float):
         """Track bot response time."""
-        self.metrics['response_times'].append(duration_seconds)
-        
-        # Keep only last 1000 response times
-        if len(self.metrics['response_times']) > 1000:
-            self.metrics['response_times'] = self.metrics['response_times'][-1000:]
-        
-        self._save_metrics()
+        # Bounded deque: keeps only the last MAX_RESPONSE_TIMES samples
+        times = self.metrics['response_times']
+        if len(times) == times.maxlen:
+            self._rt_sum -= times[0]
+        times.append(duration_seconds)
+        self._rt_sum += duration_seconds
+        self._new_samples.append(('response_times', duration_seconds))
     
+    @_locked
     def track_transaction_time(self, duration_minutes: float):
         """Track transaction completion time."""
-        if 'transaction_times' not in self.metrics:
-            self.metrics['transaction_times'] = []
-        
-        transaction_times: List[float] = self.metrics['transaction_times']  # type: ignore
-        transaction_times.append(duration_minutes)
-        
-        # Keep only last 500 transaction times
-        if len(transaction_times) > 500:
-            self.metrics['transaction_times'] = transaction_times[-500:]
-        
-        self._save_metrics()
+        # Bounded deque: keeps only the last MAX_TRANSACTION_TIMES samples
+        times = self.metrics['transaction_times']
+        if len(times) == times.maxlen:
+            self._tt_sum -= times[0]
+        times.append(duration_minutes)
+        self._tt_sum += duration_minutes
+        self._new_samples.append(('transaction_times', duration_minutes))
     
     def get_top_materials(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get most consulted materials."""
-        materials = self.metrics['materials_consulted']
-        sorted_materials = sorted(materials.items(), key=lambda x: x[1], reverse=True)
-        
         return [
             {'material': mat, 'count': count}
-            for mat, count in sorted_materials[:limit]
+            for mat, count in self.metrics['materials_consulted'].most_common(limit)
         ]
     
     def get_conversion_rate(self) -> Dict[str, float]:
@@ -222,10 +478,10 @@ class BusinessMetrics:
     
     def get_avg_response_time(self) -> float:
         """Get average response time in seconds."""
-        times = self.metrics['response_times']
-        if not times:
+        count = len(self.metrics['response_times'])
+        if not count:
             return 0.0
-        return round(sum(times) / len(times), 2)
+        return round(self._rt_sum / count, 2)
     
     def get_hot_leads(self) -> List[Dict[str, Any]]:
         """Get all hot leads."""
@@ -233,6 +489,10 @@ class BusinessMetrics:
     
     def get_dashboard(self) -> Dict[str, Any]:
         """Get complete dashboard metrics."""
+        with self._lock:
+            return self._build_dashboard()
+    
+    def _build_dashboard(self) -> Dict[str, Any]:
         return {
             'overview': {
                 'total_conversations': self.metrics['total_conversations'],
@@ -245,12 +505,8 @@ class BusinessMetrics:
             'conversion_rates': self.get_conversion_rate(),
             'avg_response_time': self.get_avg_response_time(),
             'hot_leads_count': len(self.get_hot_leads()),
-            'funnel': self.metrics['conversion_funnel'],
-            'top_intents': sorted(
-                self.metrics['intents_detected'].items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:5]
+            'funnel': dict(self.metrics['conversion_funnel']),
+            'top_intents': self.metrics['intents_detected'].most_common(5)
         }
     
     def should_escalate_to_human(self, phone: str, message_count: int, 
@@ -265,7 +521,7 @@ class BusinessMetrics:
             return True
         
         # Escalate if hot lead
-        if phone in self.metrics['hot_leads']:
+        if phone in self._hot_leads:
             return True
         
         return False
@@ -289,34 +545,57 @@ class BusinessMetrics:
         return False
     
     def get_dashboard_stats(self) -> Dict[str, Any]:
-        """Get dashboard statistics."""
+        """Get dashboard statistics (copies, so callers never share the live counters)."""
+        with self._lock:
+            return self._build_dashboard_stats()
+    
+    def _build_dashboard_stats(self) -> Dict[str, Any]:
         return {
             'total_conversations': self.metrics.get('total_conversations', 0),
             'total_messages': self.metrics.get('total_messages', 0),
             'providers': self.metrics.get('providers_count', 0),
             'buyers': self.metrics.get('buyers_count', 0),
             'hot_leads': len(self.metrics.get('hot_leads', [])),
-            'conversion_funnel': self.metrics.get('conversion_funnel', {}),
-            'materials_consulted': self.metrics.get('materials_consulted', {}),
-            'intents_detected': self.metrics.get('intents_detected', {})
+            'conversion_funnel': dict(self.metrics.get('conversion_funnel', {})),
+            'materials_consulted': dict(self.metrics.get('materials_consulted', {})),
+            'intents_detected': dict(self.metrics.get('intents_detected', {}))
         }
     
     def get_kpis(self) -> Dict[str, Any]:
         """Get key performance indicators."""
-        response_times = self.metrics.get('response_times', [])
-        transaction_times = self.metrics.get('transaction_times', [])
+        with self._lock:
+            return self._build_kpis()
+    
+    def _build_kpis(self) -> Dict[str, Any]:
+        response_count = len(self.metrics['response_times'])
+        transaction_count = len(self.metrics['transaction_times'])
         
-        avg_response = sum(response_times) / len(response_times) if response_times else 0
-        avg_transaction = sum(transaction_times) / len(transaction_times) if transaction_times else 0
+        avg_response = self._rt_sum / response_count if response_count else 0
+        avg_transaction = self._tt_sum / transaction_count if transaction_count else 0
         
         return {
             'avg_response_time_seconds': round(avg_response, 2),
+            **self._response_time_percentiles(),
             'avg_transaction_time_minutes': round(avg_transaction, 2),
             'conversion_rate': self._calculate_conversion_rate(),
             'hot_lead_rate': self._calculate_hot_lead_rate(),
             'total_revenue': 0  # To be calculated from revenue_system
         }
     
+    def _response_time_percentiles(self) -> Dict[str, float]:
+        """p50/p95/p99 of the response-time window (recomputed on every get_kpis call)."""
+        times = self.metrics['response_times']
+        if len(times) < 2:
+            value = round(times[0], 2) if times else 0.0
+            return {'p50_response_time_seconds': value, 'p95_response_time_seconds': value, 'p99_response_time_seconds': value}
+        
+        cuts = statistics.quantiles(times, n=100, method='inclusive')
+        return {
+            'p50_response_time_seconds': round(cuts[49], 2),
+            'p95_response_time_seconds': round(cuts[94], 2),
+            'p99_response_time_seconds': round(cuts[98], 2),
+        }
+    
     def _calculate_conversion_rate(self) -> float:
         """Calculate conversion rate from inquiry to closed."""
         funnel = self.metrics.get('conversion_funnel', {})
@@ -1,76 +1,153 @@
 """Advanced caching system for bot responses."""
 
-import hashlib
-import json
+import os
+import sqlite3
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import Dict, Optional, Tuple, Union
+
+from utils import normalize_message, text_digest
+
+# Default entry lifetime in seconds
+DEFAULT_MAX_AGE = 1800
+
+# In-process LRU in front of SQLite: normalized query -> (timestamp, response)
+MEM_MAX = 1024
 
 
 class ResponseCache:
-    """Simple file-based cache for frequent queries."""
+    """SQLite-backed cache for frequent queries (single keyed store, WAL mode)."""
     
     def __init__(self, cache_dir: str = "./cache"):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         self.hits = 0
         self.misses = 0
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        
+        # One B-tree lookup per query instead of stat+open+read+parse per file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.cache_dir / "cache.sqlite", isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (k TEXT PRIMARY KEY, ts REAL NOT NULL, response TEXT NOT NULL)")
+        # Expiry sweeps and stats read only this index, never the entries
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_ts ON cache (ts)")
     
-    def _get_cache_key(self, query: str) -> str:
+    def cache_key(self, query: str) -> str:
         """Generate cache key from query."""
-        normalized = query.lower().strip()
-        return hashlib.md5(normalized.encode()).hexdigest()
+        return text_digest(normalize_message(query))
+    
+    def _remember(self, normalized: str, ts: float, response: str):
+        """Store an entry in the in-process LRU (caller holds the lock)."""
+        self._mem[normalized] = (ts, response)
+        self._mem.move_to_end(normalized)
+        if len(self._mem) > MEM_MAX:
+            self._mem.popitem(last=False)
     
-    def get(self, query: str, max_age: int = 1800) -> Optional[str]:
+    def get(self, query: str, max_age: int = DEFAULT_MAX_AGE) -> Optional[str]:
         """Get cached response if exists and not expired."""
-        key = self._get_cache_key(query)
-        cache_file = self.cache_dir / f"{key}.json"
+        return self.get_normalized(normalize_message(query), max_age)
+    
+    def get_normalized(self, normalized: str, max_age: int = DEFAULT_MAX_AGE) -> Optional[str]:
+        """Like get(), for a query already passed through normalize_message."""
+        now = time.time()
         
-        if not cache_file.exists():
-            self.misses += 1
-            return None
+        with self._lock:
+            hit = self._mem.get(normalized)
+            if hit is not None and now - hit[0] <= max_age:
+                self._mem.move_to_end(normalized)
+                self.hits += 1
+                return hit[1]
+        
+        key = text_digest(normalized)
         
         try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Check expiration
-            age = time.time() - data['timestamp']
-            if age > max_age:
-                cache_file.unlink()  # Delete expired cache
-                self.misses += 1
-                return None
-            
-            self.hits += 1
-            return data['response']
-        except Exception:
+            with self._lock:
+                row = self._conn.execute("SELECT ts, response FROM cache WHERE k = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                
+                # Check expiration
+                if now - row[0] > max_age:
+                    self._conn.execute("DELETE FROM cache WHERE k = ?", (key,))  # Delete expired cache
+                    self._mem.pop(normalized, None)
+                    self.misses += 1
+                    return None
+                
+                self.hits += 1
+                self._remember(normalized, row[0], row[1])
+                return row[1]
+        except sqlite3.Error:
             self.misses += 1
             return None
     
     def set(self, query: str, response: str):
         """Save response to cache."""
-        key = self._get_cache_key(query)
-        cache_file = self.cache_dir / f"{key}.json"
+        self.set_normalized(normalize_message(query), response)
+    
+    def set_normalized(self, normalized: str, response: str):
+        """Like set(), for a query already passed through normalize_message."""
+        key = text_digest(normalized)
+        now = time.time()
         
-        data = {
-            'query': query,
-            'response': response,
-            'timestamp': time.time()
-        }
+        with self._lock:
+            self._remember(normalized, now, response)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (k, ts, response) VALUES (?, ?, ?)",
+                (key, now, response),
+            )
+    
+    def clear_expired(self, max_age: int = DEFAULT_MAX_AGE):
+        """Delete expired entries (plus leftover per-entry JSON files from the old layout)."""
+        cutoff = time.time() - max_age
+        with self._lock:
+            for normalized in [k for k, (ts, _) in self._mem.items() if ts < cutoff]:
+                del self._mem[normalized]
+            self._conn.execute("DELETE FROM cache WHERE ts < ?", (cutoff,))
+        
+        # Legacy files: judged by mtime via the DirEntry stat, never opened
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+    
+    def get_entry_counts(self, max_age: int = DEFAULT_MAX_AGE) -> Dict[str, int]:
+        """Total, valid and expired entry counts (one indexed query)."""
+        with self._lock:
+            total, valid = self._conn.execute(
+                "SELECT COUNT(*), COUNT(CASE WHEN ts >= ? THEN 1 END) FROM cache", (time.time() - max_age,)
+            ).fetchone()
         
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
+        return {
+            "total_entries": total,
+            "valid_entries": valid,
+            "expired_entries": total - valid
+        }
     
     def get_stats(self) -> Dict[str, Union[int, str]]:
         """Get cache statistics."""
         total = self.hits + self.misses
         hit_rate = (self.hits / total * 100) if total > 0 else 0
         
+        with self._lock:
+            (cached_items,) = self._conn.execute(
+                "SELECT COUNT(*) FROM cache WHERE ts > ?", (time.time() - DEFAULT_MAX_AGE,)
+            ).fetchone()
+        
         return {
             'hits': self.hits,
             'misses': self.misses,
             'hit_rate': f"{hit_rate:.1f}%",
-            'cached_items': len(list(self.cache_dir.glob('*.json')))
+            'cached_items': cached_items
         }
 
 
@@ -1,9 +1,55 @@
 """Conversation memory system with context awareness and intelligence."""
 
-import json
-from datetime import datetime, timedelta
+import asyncio
+import atexit
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import orjson
+
+from utils import logger, normalize_message, text_digest
+
+
+# Seconds between background flushes of new messages to disk
+FLUSH_INTERVAL = 2.0
+
+# History files are JSONL (one message per line, append-only); compacted on load past this many lines
+COMPACT_AFTER_LINES = 100
+
+# Messages kept per phone in the active session (older ones live only on disk)
+SESSION_MAX_MESSAGES = 20
+
+# Messages kept per phone in OpenAI format (matches the context window sent)
+OPENAI_BUFFER_SIZE = 10
+
+# Recent message digests kept per phone for duplicate detection
+DUPLICATE_WINDOW_SECONDS = 300
+MAX_RECENT_HASHES = 64
+
+# User-type keywords, scanned together in a single regex pass
+PROVIDER_KEYWORDS = ('vender', 'vendo', 'tengo material', 'recolecto', 'ofrezco', 'proveedor')
+BUYER_KEYWORDS = ('comprar', 'compro', 'necesito', 'busco material', 'empresa', 'fabrica')
+_USER_TYPE_RE = re.compile('|'.join(map(re.escape, PROVIDER_KEYWORDS + BUYER_KEYWORDS)))
+_PROVIDER_SET = frozenset(PROVIDER_KEYWORDS)
+
+# Phone -> file-name characters, applied in one str.translate pass
+_PHONE_TRANS = str.maketrans({'+': '', ':': '_'})
+
+# Suggestion triggers: keywords in the recent user messages, material families in the cart
+_SUGGESTION_KEYWORDS_RE = re.compile(r"precio|stock", re.IGNORECASE)
+_PLASTIC_RE = re.compile(r"PET|HDPE|PP")
+_METAL_RE = re.compile(r"Aluminio|Cobre")
+
+# Re-run user-type detection only after this many new messages
+TYPE_REDETECT_EVERY = 5
 
 
 class ConversationMemory:
@@ -12,84 +58,229 @@ class ConversationMemory:
     def __init__(self, storage_dir: str = "./conversations"):
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True)
-        self.active_sessions: Dict[str, List[Dict[str, str]]] = {}
+        self.active_sessions: Dict[str, Deque[Dict[str, Any]]] = {}
         self.user_profiles: Dict[str, Dict[str, Any]] = {}
-        self.message_hashes: Dict[str, List[Tuple[str, datetime]]] = {}  # Detect duplicates
-        self.material_cart: Dict[str, List[str]] = {}  # Multi-material tracking
+        # Duplicate detection, struct-of-arrays: parallel digest/timestamp rings + a set for O(1) lookup
+        self._hash_ring: Dict[str, Deque[str]] = {}
+        self._hash_ts: Dict[str, Deque[float]] = {}
+        self._hash_set: Dict[str, Set[str]] = {}
+        self.material_cart: Dict[str, Dict[str, None]] = defaultdict(dict)  # Multi-material tracking (ordered set)
+        self.openai_buffers: Dict[str, Deque[Dict[str, str]]] = {}  # History in OpenAI format
+        self._messages_added: Dict[str, int] = defaultdict(int)  # Messages added this process (monotonic)
+        self._type_detected_at: Dict[str, int] = {}  # _messages_added value at last detection
+        self._user_paths: Dict[str, Path] = {}  # Memoized _get_user_file results
+        self._known_users: Set[str] = set()  # Phones (file stems) with history on disk
+        self.invalidate()
+        
+        # Write-behind: add_message only queues the message, a daemon thread appends it to disk
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()  # Serializes appends with compaction rewrites
+        self._pending: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="conversation-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
     
     def _get_user_file(self, phone: str) -> Path:
-        """Get user conversation file path."""
-        safe_phone = phone.replace('+', '').replace(':', '_')
-        return self.storage_dir / f"{safe_phone}.json"
+        """Get user conversation file path (built once per phone)."""
+        user_file = self._user_paths.get(phone)
+        if user_file is None:
+            user_file = self.storage_dir / f"{phone.translate(_PHONE_TRANS)}.jsonl"
+            self._user_paths[phone] = user_file
+        return user_file
+    
+    def invalidate(self):
+        """Rebuild the known-users set from the storage directory (one scandir pass)."""
+        with os.scandir(self.storage_dir) as it:
+            known = {
+                entry.name.rpartition('.')[0] for entry in it
+                if entry.name.endswith(('.jsonl', '.json')) and not entry.name.startswith('.')
+            }
+        self._known_users = known
+    
+    def _session(self, phone: str) -> Deque[Dict[str, Any]]:
+        """Active session for a phone, loaded from disk on first touch (one dict probe when warm)."""
+        session = self.active_sessions.get(phone)
+        if session is None:
+            session = self.active_sessions[phone] = self._load_history(phone)
+        return session
     
     def add_message(self, phone: str, role: str, content: str):
         """Add message to conversation history."""
-        if phone not in self.active_sessions:
-            self.active_sessions[phone] = self._load_history(phone)
+        session = self._session(phone)
+        buffer = self._get_openai_buffer(phone)
         
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": time.time()
         }
         
-        self.active_sessions[phone].append(message)
-        
-        # Keep only last 20 messages
-        if len(self.active_sessions[phone]) > 20:
-            self.active_sessions[phone] = self.active_sessions[phone][-20:]
-        
-        # Save to disk periodically
-        if len(self.active_sessions[phone]) % 5 == 0:
-            self._save_history(phone)
+        with self._lock:
+            session.append(message)
+            self._pending[phone].append(message)  # Appended by the background flusher
+        self._messages_added[phone] += 1
+        buffer.append({"role": role, "content": content})
     
     def get_context(self, phone: str, max_messages: int = 10) -> List[Dict[str, str]]:
         """Get recent conversation context."""
-        if phone not in self.active_sessions:
-            self.active_sessions[phone] = self._load_history(phone)
-        
         # Return last N messages
-        return self.active_sessions[phone][-max_messages:]
+        session = self._session(phone)
+        return list(islice(session, max(len(session) - max_messages, 0), None))
+    
+    def _get_openai_buffer(self, phone: str) -> Deque[Dict[str, str]]:
+        """Get (or build from the session) the rolling OpenAI-format history."""
+        buffer = self.openai_buffers.get(phone)
+        if buffer is None:
+            buffer = deque(
+                ({"role": msg["role"], "content": msg["content"]} for msg in self.get_context(phone)),
+                maxlen=OPENAI_BUFFER_SIZE,
+            )
+            self.openai_buffers[phone] = buffer
+        return buffer
+    
+    def get_openai_messages(self, phone: str, system_message: Optional[str] = None) -> List[Dict[str, str]]:
+        """Recent history ready to send to OpenAI, optionally led by a system message."""
+        buffer = self._get_openai_buffer(phone)
+        if system_message is None:
+            return list(buffer)
+        return [{"role": "system", "content": system_message}, *buffer]
+    
+    async def aget_openai_messages(self, phone: str) -> List[Dict[str, str]]:
+        """Async variant of get_openai_messages (disk load runs in a thread)."""
+        await self._aload_session(phone)
+        return self.get_openai_messages(phone)
+    
+    async def _aload_session(self, phone: str):
+        """Load a cold session from disk without blocking the event loop."""
+        if phone in self.active_sessions:
+            return
+        history = await asyncio.to_thread(self._load_history, phone)
+        # Another request may have loaded it while we were reading
+        self.active_sessions.setdefault(phone, history)
     
-    def _load_history(self, phone: str) -> List[Dict[str, str]]:
-        """Load conversation history from disk."""
+    async def aget_context(self, phone: str, max_messages: int = 10) -> List[Dict[str, str]]:
+        """Async variant of get_context (disk load runs in a thread)."""
+        await self._aload_session(phone)
+        return self.get_context(phone, max_messages)
+    
+    async def aget_user_profile(self, phone: str) -> Dict[str, Any]:
+        """Async variant of get_user_profile (disk load runs in a thread)."""
+        await self._aload_session(phone)
+        return self.get_user_profile(phone)
+    
+    def _load_history(self, phone: str) -> Deque[Dict[str, Any]]:
+        """Load conversation history from disk (last SESSION_MAX_MESSAGES lines)."""
         user_file = self._get_user_file(phone)
         
-        if not user_file.exists():
-            return []
-        
+        # Held across read and compaction so a concurrent flush cannot append in between
+        with self._io_lock:
+            if not user_file.exists():
+                return self._migrate_legacy_history(phone)
+            
+            try:
+                lines = user_file.read_bytes().splitlines()
+            except OSError:
+                return deque(maxlen=SESSION_MAX_MESSAGES)
+            
+            messages = []
+            for line in lines[-SESSION_MAX_MESSAGES:]:
+                try:
+                    messages.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    continue  # Torn last line after a crash
+            if len(lines) > COMPACT_AFTER_LINES:
+                self._write_history(phone, messages)
+        return deque(messages, maxlen=SESSION_MAX_MESSAGES)
+    
+    def _migrate_legacy_history(self, phone: str) -> Deque[Dict[str, Any]]:
+        """One-shot migration of an old whole-file JSON history to JSONL (caller holds _io_lock)."""
+        legacy_file = self._get_user_file(phone).with_suffix('.json')
+        try:
+            messages = orjson.loads(legacy_file.read_bytes()).get('messages', [])
+            # Older files also stored ISO timestamps; sessions use epoch floats
+            for msg in messages:
+                if isinstance(msg.get('timestamp'), str):
+                    msg['timestamp'] = datetime.fromisoformat(msg['timestamp']).timestamp()
+        except (OSError, orjson.JSONDecodeError, ValueError):
+            return deque(maxlen=SESSION_MAX_MESSAGES)
+        
+        messages = messages[-SESSION_MAX_MESSAGES:]
+        self._write_history(phone, messages)
+        # Keep the original (full history) next to the new file instead of deleting it
         try:
-            with open(user_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('messages', [])
-        except Exception:
-            return []
+            legacy_file.rename(legacy_file.with_name(legacy_file.name + '.migrated'))
+        except OSError as e:
+            logger.warning(f"Could not rename migrated history {legacy_file}: {e}")
+        return deque(messages, maxlen=SESSION_MAX_MESSAGES)
     
     def _save_history(self, phone: str):
-        """Save conversation history to disk."""
+        """Rewrite the history file with the active session only (compaction)."""
+        with self._io_lock:
+            with self._lock:
+                self._pending.pop(phone, None)
+                messages = list(self.active_sessions.get(phone, ()))
+            self._write_history(phone, messages)
+    
+    def _append_history(self, phone: str, messages: List[Dict[str, Any]]):
+        """Append messages to the history file, one JSON line each."""
         user_file = self._get_user_file(phone)
+        with open(user_file, 'ab') as f:
+            f.write(b''.join([orjson.dumps(msg) + b'\n' for msg in messages]))
+        self._known_users.add(user_file.stem)
+    
+    def _write_history(self, phone: str, messages: List[Dict[str, Any]]):
+        user_file = self._get_user_file(phone)
+        buf = b''.join([orjson.dumps(msg) + b'\n' for msg in messages])
         
-        data = {
-            'phone': phone,
-            'messages': self.active_sessions.get(phone, []),
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        with open(user_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # Atomic replace: readers never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.storage_dir, prefix=f".{user_file.name}.", suffix=".tmp")
+        try:
+            try:
+                os.write(fd, buf)
+            finally:
+                os.close(fd)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates 0600 files
+            os.replace(tmp_path, user_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._known_users.add(user_file.stem)
+    
+    def _flush_loop(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self.flush()
+    
+    def flush(self):
+        """Append every message added since the last flush."""
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(list)
+            
+            for phone, messages in pending.items():
+                try:
+                    self._append_history(phone, messages)
+                except Exception:
+                    with self._lock:
+                        self._pending[phone][:0] = messages  # Retry on the next tick, order kept
+    
+    def close(self):
+        """Stop the flusher and write any pending conversations."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self.flush()
     
     def detect_user_type(self, phone: str) -> str:
         """Detect if user is provider or buyer based on conversation."""
         context = self.get_context(phone)
         
-        # Simple keyword detection
-        all_text = " ".join([msg['content'].lower() for msg in context if msg['role'] == 'user'])
+        # Simple keyword detection: one scan, every occurrence scores (frequency-weighted)
+        all_text = " ".join([msg['content'] for msg in context if msg['role'] == 'user']).lower()
         
-        provider_keywords = ['vender', 'vendo', 'tengo material', 'recolecto', 'ofrezco', 'proveedor']
-        buyer_keywords = ['comprar', 'compro', 'necesito', 'busco material', 'empresa', 'fabrica']
-        
-        provider_score = sum(1 for kw in provider_keywords if kw in all_text)
-        buyer_score = sum(1 for kw in buyer_keywords if kw in all_text)
+        found = _USER_TYPE_RE.findall(all_text)
+        provider_score = sum(1 for kw in found if kw in _PROVIDER_SET)
+        buyer_score = len(found) - provider_score
         
         if provider_score > buyer_score:
             return "provider"
@@ -100,87 +291,106 @@ class ConversationMemory:
     
     def get_user_profile(self, phone: str) -> Dict[str, Any]:
         """Get or create user profile."""
-        if phone not in self.user_profiles:
-            user_type = self.detect_user_type(phone)
-            self.user_profiles[phone] = {
+        now = time.time()
+        session = self._session(phone)
+        added = self._messages_added.get(phone, 0)
+        
+        profile = self.user_profiles.get(phone)
+        if profile is None:
+            self._type_detected_at[phone] = added
+            profile = self.user_profiles[phone] = {
                 'phone': phone,
-                'type': user_type,
-                'first_seen': datetime.now().isoformat(),
-                'message_count': len(self.get_context(phone)),
+                'type': self.detect_user_type(phone),
+                'first_seen': now,
+                'message_count': 0,
                 'materials_interested': [],
-                'last_interaction': datetime.now().isoformat(),
+                'last_interaction': now,
                 'needs_followup': False,
                 'priority': 'normal'
             }
+        elif added - self._type_detected_at.get(phone, 0) >= TYPE_REDETECT_EVERY:
+            # Memoized detection: rescan history only every few new messages
+            self._type_detected_at[phone] = added
+            user_type = self.detect_user_type(phone)
+            if user_type != 'unknown':
+                profile['type'] = user_type
         
-        # Update message count and last interaction
-        self.user_profiles[phone]['message_count'] = len(self.get_context(phone))
-        self.user_profiles[phone]['last_interaction'] = datetime.now().isoformat()
+        # Update message count (same as len(get_context()), without the slice copy) and last interaction
+        profile['message_count'] = min(len(session), 10)
+        profile['last_interaction'] = now
         
-        return self.user_profiles[phone]
+        return profile
     
-    def is_duplicate_message(self, phone: str, message: str) -> bool:
-        """Check if user sent same message recently."""
-        if phone not in self.message_hashes:
-            self.message_hashes[phone] = []
-        
-        # Clean old hashes (>5 min)
-        cutoff = datetime.now() - timedelta(minutes=5)
-        self.message_hashes[phone] = [
-            (msg, ts) for msg, ts in self.message_hashes[phone]
-            if ts > cutoff
-        ]
-        
-        # Check if message already sent
-        for msg, _ in self.message_hashes[phone]:
-            if msg.lower().strip() == message.lower().strip():
-                # Same message in last 5 min
-                return True
-        
-        # Add to history
-        self.message_hashes[phone].append((message, datetime.now()))
+    def is_duplicate_message(self, phone: str, message: str, normalized: Optional[str] = None) -> bool:
+        """Check if user sent same message recently (pass `normalized` if already computed)."""
+        ring = self._hash_ring.get(phone)
+        if ring is None:
+            ring = self._hash_ring[phone] = deque()
+            self._hash_ts[phone] = deque()
+            self._hash_set[phone] = set()
+        stamps = self._hash_ts[phone]
+        seen = self._hash_set[phone]
+        
+        # Clean old hashes (>5 min) off the left end
+        now = time.time()
+        cutoff = now - DUPLICATE_WINDOW_SECONDS
+        while stamps and stamps[0] <= cutoff:
+            stamps.popleft()
+            seen.discard(ring.popleft())
+        
+        # Check if message already sent (digest of the normalized text)
+        digest = text_digest(normalized if normalized is not None else normalize_message(message))
+        if digest in seen:
+            # Same message in last 5 min
+            return True
+        
+        # Add to history (bounded per phone)
+        if len(ring) >= MAX_RECENT_HASHES:
+            stamps.popleft()
+            seen.discard(ring.popleft())
+        ring.append(digest)
+        stamps.append(now)
+        seen.add(digest)
         return False
     
     def add_material_to_cart(self, phone: str, material: str):
         """Track multiple materials user is interested in."""
-        if phone not in self.material_cart:
-            self.material_cart[phone] = []
-        
-        if material not in self.material_cart[phone]:
-            self.material_cart[phone].append(material)
+        self.material_cart[phone][material] = None  # O(1) dedup, keeps first-seen order
     
     def get_material_cart(self, phone: str) -> List[str]:
         """Get all materials user asked about."""
-        return self.material_cart.get(phone, [])
+        return list(self.material_cart.get(phone, ()))
     
-    def get_contextual_suggestion(self, phone: str) -> Optional[str]:
+    def get_contextual_suggestion(self, phone: str, user_profile: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """Generate smart suggestion based on conversation context."""
         context = self.get_context(phone)
         if len(context) < 2:
             return None
         
-        user_profile = self.get_user_profile(phone)
+        if user_profile is None:
+            user_profile = self.get_user_profile(phone)
         user_type = user_profile.get('type', 'unknown')
         materials_cart = self.get_material_cart(phone)
         
-        # Recent messages (last 3)
-        recent = [msg['content'].lower() for msg in context[-3:] if msg['role'] == 'user']
-        recent_text = ' '.join(recent)
+        # Recent messages (last 3): one case-insensitive scan for every trigger keyword
+        recent_text = ' '.join([msg['content'] for msg in context[-3:] if msg['role'] == 'user'])
+        keywords = {kw.lower() for kw in _SUGGESTION_KEYWORDS_RE.findall(recent_text)}
+        asked_price = 'precio' in keywords
         
         # Suggestion 1: If asked about price of one material, suggest others in category
-        if 'precio' in recent_text and len(materials_cart) == 1:
+        if asked_price and len(materials_cart) == 1:
             material = materials_cart[0]
-            if 'PET' in material or 'HDPE' in material or 'PP' in material:
+            if _PLASTIC_RE.search(material):
                 return "💡 También tenemos otros plásticos (HDPE, PP, LDPE). ¿Te interesa ver sus precios?"
-            elif 'Aluminio' in material or 'Cobre' in material:
+            elif _METAL_RE.search(material):
                 return "💡 También manejamos otros metales (Acero, Bronce). ¿Quieres saber más?"
         
         # Suggestion 2: If provider asked stock, suggest connecting with buyers
-        if user_type == 'provider' and 'stock' in recent_text:
+        if user_type == 'provider' and 'stock' in keywords:
             return "💡 Tenemos compradores interesados en tu material. ¿Quieres que te conectemos?"
         
         # Suggestion 3: If buyer asked price, suggest volume discounts
-        if user_type == 'buyer' and 'precio' in recent_text:
+        if user_type == 'buyer' and asked_price:
             return "💡 Manejamos descuentos por volumen. ¿Cuántas toneladas necesitas?"
         
         # Suggestion 4: If many materials asked, offer summary
@@ -199,20 +409,18 @@ class ConversationMemory:
     
     def set_priority(self, phone: str, priority: str):
         """Set user priority (normal, high, urgent)."""
-        if phone in self.user_profiles:
-            self.user_profiles[phone]['priority'] = priority
+        profile = self.user_profiles.get(phone)
+        if profile is not None:
+            profile['priority'] = priority
     
     def needs_followup(self, phone: str) -> bool:
         """Check if user needs follow-up message."""
-        if phone not in self.user_profiles:
+        profile = self.user_profiles.get(phone)
+        if profile is None:
             return False
         
-        profile = self.user_profiles[phone]
-        last_interaction = datetime.fromisoformat(profile['last_interaction'])
-        
         # Follow-up if last interaction was 2+ days ago and had interest
-        time_diff = datetime.now() - last_interaction
-        if time_diff.total_seconds() > 172800:  # 2 days
+        if time.time() - profile['last_interaction'] > 172800:  # 2 days
             if len(self.get_material_cart(phone)) > 0:
                 return True
         
@@ -229,8 +437,8 @@ class ConversationMemory:
             'user_type': profile['type'],
             'message_count': len(context),
             'materials_interested': materials,
-            'first_seen': profile['first_seen'],
-            'last_interaction': profile['last_interaction'],
+            'first_seen': datetime.fromtimestamp(profile['first_seen']).isoformat(),
+            'last_interaction': datetime.fromtimestamp(profile['last_interaction']).isoformat(),
             'priority': profile.get('priority', 'normal'),
             'conversation_preview': [
                 f"{msg['role']}: {msg['content'][:100]}"
@@ -243,10 +451,11 @@ class ConversationMemory:
         if phone in self.active_sessions:
             self._save_history(phone)
             del self.active_sessions[phone]
+        self.openai_buffers.pop(phone, None)
     
     def get_stats(self) -> Dict[str, int]:
         """Get memory statistics."""
-        total_users = len(list(self.storage_dir.glob('*.json')))
+        total_users = len(self._known_users)
         active_sessions = len(self.active_sessions)
         total_messages = sum(len(msgs) for msgs in self.active_sessions.values())
         
@@ -2,7 +2,6 @@
 
 import os
 from pathlib import Path
-from typing import Optional
 
 from dotenv import load_dotenv
 
@@ -11,26 +10,39 @@ env_path = Path(__file__).parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
 
-def get_required_env[T](env_name: str, default_value: Optional[str] = None) -> str:
-    """Validate and return an environmental variable."""
-    env_var = os.getenv(env_name)
+_env = os.environ
 
-    if env_var is None:
-        if default_value is not None:
-            return default_value
-        error_message = f"{env_name} environmental variable not found."
-        raise RuntimeError(error_message)
+REQUIRED_ENV = (
+    "PROJECT_NAME",
+    "TWILIO_ACCOUNT_SID",
+    "TWILIO_AUTH_TOKEN",
+    "TWILIO_NUMBER",
+    "TWILIO_MESSAGING_SERVICE_SID",
+    "OPENAI_API_KEY",
+)
 
-    return env_var
+# Validate in one pass so every missing variable is reported at once
+_missing = [name for name in REQUIRED_ENV if name not in _env]
+if _missing:
+    raise RuntimeError(f"Missing environmental variables: {', '.join(_missing)}")
 
 
-PROJECT_NAME = get_required_env("PROJECT_NAME")
+PROJECT_NAME = _env["PROJECT_NAME"]
 
 # Find your Account SID and Auth Token at twilio.com/console
 # and set the environment variables. See http://twil.io/secure
-TWILIO_ACCOUNT_SID = get_required_env("TWILIO_ACCOUNT_SID")
-TWILIO_AUTH_TOKEN = get_required_env("TWILIO_AUTH_TOKEN")
-TWILIO_NUMBER = get_required_env("TWILIO_NUMBER")
-TWILIO_MESSAGING_SERVICE_SID = get_required_env("TWILIO_MESSAGING_SERVICE_SID")
+TWILIO_ACCOUNT_SID = _env["TWILIO_ACCOUNT_SID"]
+TWILIO_AUTH_TOKEN = _env["TWILIO_AUTH_TOKEN"]
+TWILIO_NUMBER = _env["TWILIO_NUMBER"]
+TWILIO_MESSAGING_SERVICE_SID = _env["TWILIO_MESSAGING_SERVICE_SID"]
 
-OPENAI_API_KEY = get_required_env("OPENAI_API_KEY")
+OPENAI_API_KEY = _env["OPENAI_API_KEY"]
+
+# Whisper backend: "api" (OpenAI) or "local" (faster-whisper, poetry install -E local-whisper)
+WHISPER_BACKEND = _env.get("WHISPER_BACKEND", "api")
+WHISPER_LOCAL_MODEL = _env.get("WHISPER_LOCAL_MODEL", "small")
+WHISPER_DEVICE = _env.get("WHISPER_DEVICE", "auto")
+WHISPER_COMPUTE_TYPE = _env.get("WHISPER_COMPUTE_TYPE", "int8")
+
+# Optional Redis for memory.py (poetry install -E redis); unset keeps memory in-process
+REDIS_URL = _env.get("REDIS_URL")
@@ -1,7 +1,10 @@
 """Input validation for materials, quantities, and business data."""
 
 import re
-from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from rapidfuzz import fuzz, process
 
 
 # Materiales válidos del catálogo
@@ -14,6 +17,15 @@ VALID_MATERIALS = {
     'especiales': ['Tetrapak', 'Baterías de Plomo']
 }
 
+# Índice del catálogo: nombre en minúsculas -> (material, categoría), en orden del catálogo
+_MATERIAL_INDEX = {
+    material.lower(): (material, category)
+    for category, materials in VALID_MATERIALS.items()
+    for material in materials
+}
+_ALL_MATERIALS = [material for material, _ in _MATERIAL_INDEX.values()]
+_ALL_MATERIALS_LOWER = list(_MATERIAL_INDEX)
+
 # Rangos válidos de cantidades
 QUANTITY_RANGES = {
     'kg': {'min': 1, 'max': 100000},
@@ -21,6 +33,45 @@ QUANTITY_RANGES = {
     'gramos': {'min': 100, 'max': 1000000}
 }
 
+# Unidad escrita -> unidad canónica, y factor de conversión a kg
+_UNIT_MAP = {
+    'ton': 'toneladas', 'tons': 'toneladas', 'tn': 'toneladas', 't': 'toneladas',
+    'toneladas': 'toneladas', 'tonelada': 'toneladas',
+    'kg': 'kg', 'kgs': 'kg', 'kilo': 'kg', 'kilos': 'kg', 'kilogramo': 'kg', 'kilogramos': 'kg',
+    'gramos': 'gramos', 'gr': 'gramos', 'grs': 'gramos', 'g': 'gramos', 'gramo': 'gramos',
+}
+_KG_FACTOR = {'toneladas': 1000, 'kg': 1, 'gramos': 0.001}
+
+# Teléfono peruano: +51999999999, 51999999999 o 999999999 (se captura el número de 9 dígitos)
+_PHONE_CLEAN_RE = re.compile(r'[^\d+]')
+_PHONE_RE = re.compile(r'(?:\+?51)?(\d{9})')
+_EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+
+def _closest(query: str, choices: Sequence[str], limit: int, score_cutoff: float) -> List[int]:
+    """
+    Índices de las opciones más parecidas (similitud de edición 0-100), de mejor a peor.
+    """
+    return [index for _, _, index in process.extract(
+        query, choices, scorer=fuzz.ratio, limit=limit, score_cutoff=score_cutoff
+    )]
+
+
+@lru_cache(maxsize=1024)
+def _find_material(material_lower: str) -> Optional[Tuple[str, str]]:
+    """(material, categoría) del catálogo que coincide con el texto, o None."""
+    # Coincidencia exacta: O(1)
+    hit = _MATERIAL_INDEX.get(material_lower)
+    if hit is not None:
+        return hit
+    
+    # Coincidencia parcial: una sola pasada por el catálogo
+    for valid_lower, hit in _MATERIAL_INDEX.items():
+        if material_lower in valid_lower or valid_lower in material_lower:
+            return hit
+    
+    return None
+
 
 def validate_material(material: str) -> Tuple[bool, Optional[str], Optional[str]]:
     """
@@ -29,22 +80,15 @@ def validate_material(material: str) -> Tuple[bool, Optional[str], Optional[str]
     """
     material_lower = material.lower().strip()
     
-    # Buscar en todas las categorías
-    for category, materials in VALID_MATERIALS.items():
-        for valid_material in materials:
-            if material_lower in valid_material.lower() or valid_material.lower() in material_lower:
-                return True, valid_material, category
+    hit = _find_material(material_lower)
+    if hit is not None:
+        return True, hit[0], hit[1]
     
     # Sugerencias si no encuentra
-    suggestions: List[str] = []
-    for category, materials in VALID_MATERIALS.items():
-        for valid_material in materials:
-            # Similitud básica por caracteres comunes
-            if any(char in valid_material.lower() for char in material_lower.split()):
-                suggestions.append(valid_material)
+    suggestions = [_ALL_MATERIALS[index] for index in _closest(material_lower, _ALL_MATERIALS_LOWER, 3, 60)]
     
     if suggestions:
-        return False, None, f"¿Quisiste decir: {', '.join(suggestions[:3])}?"
+        return False, None, f"¿Quisiste decir: {', '.join(suggestions)}?"
     
     return False, None, None
 
@@ -54,16 +98,9 @@ def validate_quantity(value: float, unit: str) -> Tuple[bool, Optional[str]]:
     Valida si la cantidad está en rango válido.
     Retorna: (es_valido, mensaje_error)
     """
-    unit_lower = unit.lower()
-    
     # Normalizar unidad
-    if unit_lower in ['ton', 'toneladas', 'tonelada', 't']:
-        unit_key = 'toneladas'
-    elif unit_lower in ['kg', 'kilo', 'kilos', 'kilogramos']:
-        unit_key = 'kg'
-    elif unit_lower in ['gramos', 'gr', 'g', 'gramo']:
-        unit_key = 'gramos'
-    else:
+    unit_key = _UNIT_MAP.get(unit.lower())
+    if unit_key is None:
         return False, f"Unidad '{unit}' no reconocida. Usa: kg, toneladas o gramos"
     
     # Validar rango
@@ -86,17 +123,9 @@ def normalize_quantity(value: float, unit: str) -> Dict[str, Any]:
     Normaliza cantidades a kg y toneladas.
     Retorna: {kg: float, toneladas: float, original: str}
     """
-    unit_lower = unit.lower()
-    
-    # Convertir todo a kg primero
-    if unit_lower in ['ton', 'toneladas', 'tonelada', 't']:
-        kg = value * 1000
-    elif unit_lower in ['kg', 'kilo', 'kilos', 'kilogramos']:
-        kg = value
-    elif unit_lower in ['gramos', 'gr', 'g', 'gramo']:
-        kg = value / 1000
-    else:
-        kg = value  # default
+    # Convertir todo a kg primero (unidad desconocida: se asume kg)
+    unit_key = _UNIT_MAP.get(unit.lower())
+    kg = value * _KG_FACTOR[unit_key] if unit_key is not None else value
     
     toneladas = kg / 1000
     
@@ -113,32 +142,19 @@ def validate_phone(phone: str) -> Tuple[bool, Optional[str]]:
     Retorna: (es_valido, telefono_normalizado)
     """
     # Limpiar caracteres
-    clean = re.sub(r'[^\d+]', '', phone)
-    
-    # Patrones válidos para Perú
-    patterns = [
-        r'^\+51\d{9}$',  # +51999999999
-        r'^51\d{9}$',    # 51999999999
-        r'^\d{9}$'       # 999999999
-    ]
-    
-    for pattern in patterns:
-        if re.match(pattern, clean):
-            # Normalizar a formato +51
-            if clean.startswith('+51'):
-                return True, clean
-            elif clean.startswith('51'):
-                return True, f"+{clean}"
-            else:
-                return True, f"+51{clean}"
+    clean = _PHONE_CLEAN_RE.sub('', phone)
+    
+    # Una sola comparación; se normaliza a formato +51
+    match = _PHONE_RE.fullmatch(clean)
+    if match:
+        return True, f"+51{match.group(1)}"
     
     return False, None
 
 
 def validate_email(email: str) -> bool:
     """Valida formato de email."""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.fullmatch(email) is not None
 
 
 def validate_price(price: float, currency: str = 'S/') -> Tuple[bool, Optional[str]]:
@@ -171,10 +187,9 @@ def validate_business_data(data: Dict[str, Any]) -> Tuple[bool, List[str]]:
         if field not in data or not data[field]:
             errors.append(f"Falta campo requerido: {field}")
     
-    # Validar material
+    # Validar material (sin calcular sugerencias, que aquí no se usan)
     if 'material' in data:
-        is_valid, _, _ = validate_material(data['material'])
-        if not is_valid:
+        if _find_material(data['material'].lower().strip()) is None:
             errors.append(f"Material no válido: {data['material']}")
     
     # Validar cantidad
@@ -197,27 +212,28 @@ def validate_business_data(data: Dict[str, Any]) -> Tuple[bool, List[str]]:
     return len(errors) == 0, errors
 
 
-def suggest_correction(input_text: str, valid_options: List[str]) -> Optional[str]:
+def validate_business_data_batch(rows: List[Dict[str, Any]]) -> Tuple[List[bool], List[List[str]]]:
     """
-    Sugiere la opción más similar del catálogo.
-    Usa distancia de Levenshtein simplificada.
+    Valida muchas filas de negociación de una vez.
+    Los materiales repetidos entre filas se resuelven una sola vez (caché compartida).
+    Retorna: (lista_de_validez, lista_de_errores_por_fila)
     """
-    input_lower = input_text.lower()
-    best_match = None
-    best_score = 0
-    
-    for option in valid_options:
-        option_lower = option.lower()
-        
-        # Calcular similitud por caracteres comunes
-        common_chars = sum(1 for c in input_lower if c in option_lower)
-        similarity = common_chars / max(len(input_lower), len(option_lower))
-        
-        if similarity > best_score and similarity > 0.5:  # 50% similitud mínima
-            best_score = similarity
-            best_match = option
+    results = [validate_business_data(row) for row in rows]
+    return [is_valid for is_valid, _ in results], [errors for _, errors in results]
+
+
+def suggest_correction(input_text: str, valid_options: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Sugiere la opción más similar (por defecto, del catálogo de materiales).
+    Usa similitud de edición normalizada (50% mínimo).
+    """
+    if valid_options is None:
+        valid_options, options_lower = _ALL_MATERIALS, _ALL_MATERIALS_LOWER  # Precalculado al importar
+    else:
+        options_lower = [option.lower() for option in valid_options]
     
-    return best_match
+    best = _closest(input_text.lower(), options_lower, 1, 50)
+    return valid_options[best[0]] if best else None
 
 
 def format_validation_error(errors: List[str]) -> str:
@@ -1,7 +1,8 @@
 """Intent detection, sentiment analysis and text corrections."""
 
 import re
-from typing import Any, Dict, List, Tuple
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Set, Tuple
 
 
 # Definición de intenciones y sus patrones
@@ -95,23 +96,161 @@ SENTIMENT_PATTERNS = {
     ]
 }
 
+# Patrones de materiales
+MATERIAL_PATTERNS = {
+    'PET': ['pet', 'polietileno tereftalato', 'botellas plástico'],
+    'HDPE': ['hdpe', 'polietileno alta densidad', 'envases plástico'],
+    'LDPE': ['ldpe', 'polietileno baja densidad', 'bolsas'],
+    'PP': ['pp', 'polipropileno', 'tapas'],
+    'Aluminio': ['aluminio', 'aliminio', 'latas'],
+    'Cobre': ['cobre', 'kobre', 'cables'],
+    'Acero': ['acero', 'acro', 'chatarra'],
+    'Bronce': ['bronce'],
+    'Papel': ['papel', 'papeles'],
+    'Cartón': ['cartón', 'carton', 'cajas'],
+    'Vidrio': ['vidrio', 'vidio', 'botellas vidrio'],
+    'Tetrapak': ['tetrapak', 'tetrapack']
+}
+
+
+def _compile_categories(categories: Dict[str, List[str]]) -> Dict[str, re.Pattern[str]]:
+    """Una alternancia precompilada por categoría (mismo criterio que `in`: subcadena)."""
+    return {
+        name: re.compile('|'.join(map(re.escape, patterns)))
+        for name, patterns in categories.items()
+    }
+
+
+_INTENT_RES = _compile_categories(INTENTS)
+_SENTIMENT_RES = _compile_categories(SENTIMENT_PATTERNS)
+_MATERIAL_RES = _compile_categories(MATERIAL_PATTERNS)
+
+
+def _build_pattern_scanner() -> Tuple[re.Pattern[str], Dict[str, FrozenSet[Tuple[str, str]]]]:
+    """
+    Un solo escáner para intenciones, sentimiento y materiales (estilo Aho-Corasick).
+    El lookahead prueba cada posición; la alternancia va de mayor a menor longitud y
+    cada patrón arrastra las etiquetas de los patrones que son prefijo suyo, así no se
+    pierde ninguna coincidencia solapada.
+    """
+    labels: Dict[str, Set[Tuple[str, str]]] = {}
+    for kind, categories in (('intent', INTENTS), ('sentiment', SENTIMENT_PATTERNS), ('material', MATERIAL_PATTERNS)):
+        for label, patterns in categories.items():
+            for pattern in patterns:
+                labels.setdefault(pattern, set()).add((kind, label))
+    
+    ordered = sorted(labels, key=len, reverse=True)
+    pattern_labels = {
+        pattern: frozenset().union(*(labels[prefix] for prefix in ordered if pattern.startswith(prefix)))
+        for pattern in ordered
+    }
+    scanner = re.compile('(?=(' + '|'.join(map(re.escape, ordered)) + '))')
+    return scanner, pattern_labels
+
+
+_PATTERN_SCANNER, _PATTERN_LABELS = _build_pattern_scanner()
+
+
+def _scan_patterns(message_lower: str) -> Set[Tuple[str, str]]:
+    """Todas las (categoría, etiqueta) presentes en el texto, en una pasada."""
+    hits: Set[Tuple[str, str]] = set()
+    for match in _PATTERN_SCANNER.finditer(message_lower):
+        hits |= _PATTERN_LABELS[match.group(1)]
+    return hits
+
+
+# Autocorrección: claves más largas primero ("q precio" antes que "q es"), palabras completas
+_CORRECTIONS_RE = re.compile(
+    r'\b(?:' + '|'.join(map(re.escape, sorted(CORRECTIONS, key=len, reverse=True))) + r')\b',
+    re.IGNORECASE,
+)
+
+# Cantidades: "50 kg", "500 kgs", "5 toneladas", "2 tons", "10 tn", "medio kilo", "500 gr" (una sola pasada);
+# el \b final evita leer "5 tapas" como 5 toneladas
+_QUANTITY_RE = re.compile(
+    r'(?P<num>\d+\.?\d*)\s*(?P<unit>kgs?|kilos?|kilogramos?|tons?|toneladas?|tn|t|gramos?|grs?|g)\b'
+    r'|(?:medio|media)\s*(?P<half_unit>kilo|tonelada)'
+)
+
+# Normalización de unidades
+_UNIT_NORM = {
+    'kg': 'kg', 'kgs': 'kg', 'kilo': 'kg', 'kilos': 'kg', 'kilogramo': 'kg', 'kilogramos': 'kg',
+    'ton': 'toneladas', 'tons': 'toneladas', 'tn': 'toneladas', 't': 'toneladas',
+    'tonelada': 'toneladas', 'toneladas': 'toneladas',
+    'gramos': 'gramos', 'gramo': 'gramos', 'gr': 'gramos', 'grs': 'gramos', 'g': 'gramos',
+}
+
+
+class Sentiment(NamedTuple):
+    positive: bool
+    negative: bool
+    urgent: bool
+    question: bool
+
+
+class Quantity(NamedTuple):
+    value: float
+    unit: str
+    original: str
+
+
+class MessageAnalysis(NamedTuple):
+    """Resultado inmutable de analyze(); as_dict() da la forma de dict de analyze_message."""
+    original: str
+    corrected: str
+    corrections: Tuple[str, ...]
+    intents: Tuple[str, ...]
+    sentiment: Sentiment
+    materials: Tuple[str, ...]
+    quantities: Tuple[Quantity, ...]
+    
+    @property
+    def has_question(self) -> bool:
+        return self.sentiment.question
+    
+    @property
+    def is_urgent(self) -> bool:
+        return self.sentiment.urgent
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'original': self.original,
+            'corrected': self.corrected,
+            'corrections': list(self.corrections),
+            'intents': list(self.intents),
+            'sentiment': self.sentiment._asdict(),
+            'materials': list(self.materials),
+            'quantities': [q._asdict() for q in self.quantities],
+            'has_question': self.sentiment.question,
+            'is_urgent': self.sentiment.urgent
+        }
+
+
+# Los resultados memoizados son inmutables (tuplas); las funciones públicas devuelven copias mutables
+ANALYSIS_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def _detect_intent_cached(message: str) -> Tuple[str, ...]:
+    message_lower = message.lower()
+    return tuple(intent for intent, regex in _INTENT_RES.items() if regex.search(message_lower))
+
 
 def detect_intent(message: str) -> List[str]:
     """
     Detecta las intenciones del usuario en el mensaje.
     Puede devolver múltiples intenciones.
     """
+    return list(_detect_intent_cached(message))
+
+
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def _detect_sentiment_cached(message: str) -> Tuple[Tuple[str, bool], ...]:
     message_lower = message.lower()
-    detected_intents: List[str] = []
-    
-    for intent, patterns in INTENTS.items():
-        for pattern in patterns:
-            if pattern in message_lower:
-                if intent not in detected_intents:
-                    detected_intents.append(intent)
-                break
-    
-    return detected_intents
+    return tuple(
+        (sentiment_type, regex.search(message_lower) is not None)
+        for sentiment_type, regex in _SENTIMENT_RES.items()
+    )
 
 
 def detect_sentiment(message: str) -> Dict[str, bool]:
@@ -119,22 +258,7 @@ def detect_sentiment(message: str) -> Dict[str, bool]:
     Analiza el sentimiento del mensaje.
     Retorna dict con: positive, negative, urgent, question
     """
-    message_lower = message.lower()
-    
-    sentiment = {
-        'positive': False,
-        'negative': False,
-        'urgent': False,
-        'question': False
-    }
-    
-    for sentiment_type, patterns in SENTIMENT_PATTERNS.items():
-        for pattern in patterns:
-            if pattern in message_lower:
-                sentiment[sentiment_type] = True
-                break
-    
-    return sentiment
+    return dict(_detect_sentiment_cached(message))
 
 
 def autocorrect_text(message: str) -> Tuple[str, List[str]]:
@@ -142,57 +266,31 @@ def autocorrect_text(message: str) -> Tuple[str, List[str]]:
     Corrige errores comunes de tipeo.
     Retorna: (texto_corregido, lista_de_correcciones)
     """
-    corrected = message
+    corrected, corrections = _autocorrect_cached(message)
+    return corrected, list(corrections)
+
+
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def _autocorrect_cached(message: str) -> Tuple[str, Tuple[str, ...]]:
     corrections_made: List[str] = []
     
-    # Correcciones palabra por palabra
-    words = message.split()
-    corrected_words: List[str] = []
+    def _fix(match: re.Match[str]) -> str:
+        corrected_word = CORRECTIONS[match.group(0).lower()]
+        corrections_made.append(f"{match.group(0)} → {corrected_word}")
+        return corrected_word
     
-    for word in words:
-        word_lower = word.lower()
-        if word_lower in CORRECTIONS:
-            corrected_word = CORRECTIONS[word_lower]
-            corrected_words.append(corrected_word)
-            corrections_made.append(f"{word} → {corrected_word}")
-        else:
-            corrected_words.append(word)
-    
-    corrected = ' '.join(corrected_words)
+    # Una sola pasada; conserva el espaciado original y admite claves de varias palabras
+    corrected = _CORRECTIONS_RE.sub(_fix, message)
     
-    return corrected, corrections_made
+    return corrected, tuple(corrections_made)
 
 
 def extract_materials(message: str) -> List[str]:
     """
     Extrae nombres de materiales mencionados en el mensaje.
     """
-    material_patterns = {
-        'PET': ['pet', 'polietileno tereftalato', 'botellas plástico'],
-        'HDPE': ['hdpe', 'polietileno alta densidad', 'envases plástico'],
-        'LDPE': ['ldpe', 'polietileno baja densidad', 'bolsas'],
-        'PP': ['pp', 'polipropileno', 'tapas'],
-        'Aluminio': ['aluminio', 'aliminio', 'latas'],
-        'Cobre': ['cobre', 'kobre', 'cables'],
-        'Acero': ['acero', 'acro', 'chatarra'],
-        'Bronce': ['bronce'],
-        'Papel': ['papel', 'papeles'],
-        'Cartón': ['cartón', 'carton', 'cajas'],
-        'Vidrio': ['vidrio', 'vidio', 'botellas vidrio'],
-        'Tetrapak': ['tetrapak', 'tetrapack']
-    }
-    
     message_lower = message.lower()
-    materials: List[str] = []
-    
-    for material, patterns in material_patterns.items():
-        for pattern in patterns:
-            if pattern in message_lower:
-                if material not in materials:
-                    materials.append(material)
-                break
-    
-    return materials
+    return [material for material, regex in _MATERIAL_RES.items() if regex.search(message_lower)]
 
 
 def extract_quantities(message: str) -> List[Dict[str, Any]]:
@@ -200,69 +298,61 @@ def extract_quantities(message: str) -> List[Dict[str, Any]]:
     Extrae cantidades mencionadas (kg, toneladas, etc).
     Retorna lista de {value: float, unit: str}
     """
-    # Patrones: "50 kg", "5 toneladas", "medio kilo", "5 ton"
-    patterns = [
-        r'(\d+\.?\d*)\s*(kg|kilo|kilos|kilogramos)',
-        r'(\d+\.?\d*)\s*(ton|toneladas?|t)',
-        r'(medio|media)\s*(kilo|tonelada)',
-        r'(\d+)\s*(gramos?|gr|g)'
-    ]
-    
-    quantities: List[Dict[str, Any]] = []
+    return [q._asdict() for q in _iter_quantities(message.lower())]
+
+
+def _iter_quantities(message_lower: str) -> Iterator[Quantity]:
+    for match in _QUANTITY_RE.finditer(message_lower):
+        if match.group('num') is not None:
+            value = float(match.group('num'))
+            unit = match.group('unit')
+        else:
+            value = 0.5  # "medio" / "media"
+            unit = match.group('half_unit')
+        
+        yield Quantity(value, _UNIT_NORM.get(unit, unit), match.group(0))
+
+
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def _analyze_cached(message: str) -> MessageAnalysis:
+    # Autocorrección primero
+    corrected_text, corrections = _autocorrect_cached(message)
     
-    for pattern in patterns:
-        matches = re.finditer(pattern, message.lower())
-        for match in matches:
-            value_str = match.group(1)
-            unit = match.group(2)
-            
-            # Convertir a número
-            if value_str in ['medio', 'media']:
-                value = 0.5
-            else:
-                value = float(value_str)
-            
-            # Normalizar unidad
-            if unit in ['ton', 'toneladas', 'tonelada', 't']:
-                normalized_unit = 'toneladas'
-            elif unit in ['kg', 'kilo', 'kilos', 'kilogramos']:
-                normalized_unit = 'kg'
-            elif unit in ['gramos', 'gr', 'g', 'gramo']:
-                normalized_unit = 'gramos'
-            else:
-                normalized_unit = unit
-            
-            quantities.append({
-                'value': value,
-                'unit': normalized_unit,
-                'original': match.group(0)
-            })
+    # Análisis sobre texto corregido: intenciones, sentimiento y materiales en una pasada
+    corrected_lower = corrected_text.lower()  # Una sola vez para todo el análisis
+    hits = _scan_patterns(corrected_lower)
     
-    return quantities
+    return MessageAnalysis(
+        original=message,
+        corrected=corrected_text,
+        corrections=corrections,
+        intents=tuple(intent for intent in INTENTS if ('intent', intent) in hits),
+        sentiment=Sentiment(*(('sentiment', sentiment_type) in hits for sentiment_type in Sentiment._fields)),
+        materials=tuple(material for material in MATERIAL_PATTERNS if ('material', material) in hits),
+        quantities=tuple(_iter_quantities(corrected_lower)),
+    )
+
+
+def analyze(message: str) -> MessageAnalysis:
+    """
+    Análisis completo, memoizado sobre el texto normalizado (espacios).
+    El resultado es inmutable y compartido: no se copia en cada llamada.
+    """
+    return _analyze_cached(" ".join(message.split()))
 
 
 def analyze_message(message: str) -> Dict[str, Any]:
     """
-    Análisis completo del mensaje.
-    Retorna dict con: intents, sentiment, materials, quantities, corrected_text
+    Análisis completo del mensaje (vía analyze(), memoizado).
+    Retorna un dict nuevo con: intents, sentiment, materials, quantities, corrected_text;
+    el llamador puede mutarlo.
     """
-    # Autocorrección primero
-    corrected_text, corrections = autocorrect_text(message)
-    
-    # Análisis sobre texto corregido
-    intents = detect_intent(corrected_text)
-    sentiment = detect_sentiment(corrected_text)
-    materials = extract_materials(corrected_text)
-    quantities = extract_quantities(corrected_text)
-    
-    return {
-        'original': message,
-        'corrected': corrected_text,
-        'corrections': corrections,
-        'intents': intents,
-        'sentiment': sentiment,
-        'materials': materials,
-        'quantities': quantities,
-        'has_question': sentiment['question'],
-        'is_urgent': sentiment['urgent']
-    }
+    return analyze(message).as_dict()
+
+
+def analyze_batch(messages: List[str]) -> List[Dict[str, Any]]:
+    """
+    analyze_message para un lote (los textos repetidos salen de la caché de analyze()).
+    Retorna un dict independiente por mensaje, en el mismo orden.
+    """
+    return [analyze_message(message) for message in messages]
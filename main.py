@@ -3,47 +3,283 @@
 # ruff: noqa: N803 (Twilio API requires Capitalized variable names)
 # ruff: noqa: B008 (fastapi makes use of reusable default function calls)
 
+import asyncio
+import re
+import sys
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
-from fastapi import FastAPI, Form, Request, status
+from fastapi import BackgroundTasks, FastAPI, Form, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
-from ai import get_response, identify_image
-from audio_processor import audio_processor
 from business_metrics import metrics
 from rating_system import rating_system
 from revenue_system import revenue_system
 from transaction_system import transaction_system
 from utils import logger
 from warehouse_system import warehouse_system
-from wsp import send_message
+from wsp import aclose_http, send_message, send_messages
 
-app = FastAPI(title="Selva d'Or - Circular Economy Platform", version="2.0.0")
+# ai and audio_processor (OpenAI SDK, prompt tables) are imported on first use inside
+# the /message handlers, so /health and the business endpoints start without them
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release pooled HTTP clients on shutdown."""
+    yield
+    ai = sys.modules.get("ai")
+    if ai is not None:
+        await ai.aclose_clients()
+    await aclose_http()
+
+
+app = FastAPI(
+    title="Selva d'Or - Circular Economy Platform",
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+
+# === MESSAGE TEMPLATES ===
+# Parsed once at import; filled per request with str.format_map
+
+_RATING_CONFIRM_TMPL = """\
+✅ ¡Gracias por tu calificación de {stars} {star_icons}!
+
+Tu nivel: *{reward_level}* 🏆
+Bonus en próximas ventas: *+{bonus_percentage}%*
+
+¿En qué más puedo ayudarte?"""
+
+_QUOTATION_TMPL = """\
+📋 *COTIZACIÓN GENERADA*
+
+Código: *{code}*
+Material: {material}
+Cantidad estimada: {estimated_kg} kg
+Precio: S/ {price_per_kg}/kg
+Total estimado: S/ {total_estimated}
+
+⏰ Válido hasta: {expires_at}
+
+📸 *Siguiente paso:*
+Envía una foto de tu material con el código {code} visible para verificar."""
+
+_CONFIRMATION_TMPL = """\
+✅ *TRANSACCIÓN COMPLETADA*
+
+ID: {transaction_id}
+Material: {material}
+Peso: {actual_kg} kg
+Total pagado: S/ {total_amount}
+Método: {payment_method}
+
+📍 Bodega: {warehouse_id}
+⏱️ Tiempo total: {duration_minutes} minutos"""
+
+_ASSIGN_TMPL = """\
+📍 *BODEGA ASIGNADA*
+
+🏪 {warehouse_name}
+📌 {warehouse_address}
+📞 {warehouse_phone}
+
+📏 Distancia: {distance_km} km
+⏰ Horario: {opening_hours}
+
+*Instrucciones:*
+1. Muestra este mensaje al llegar
+2. Código de verificación: {code}
+3. Lleva tu material para pesaje
+
+¿Necesitas indicaciones para llegar?"""
+
+_RATING_THANKS_TMPL = """\
+✅ ¡Gracias por tu calificación!
+
+Tu nivel: *{reward_level}* 🏆
+Promedio: {average_stars} ⭐
+Bonus: +{bonus_percentage}% en próximas ventas
+
+Sigue así para desbloquear más beneficios!"""
+
+
+# Collapses whitespace runs in validation messages into single spaces
+_WS_RE = re.compile(r"\s+")
 
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(
     request: Request, exc: RequestValidationError
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Handle validation errors."""
-    exc_str = f"{exc}".replace("\n", " ").replace("   ", " ")
-    logger.error(f"{request}: {exc_str}")
+    exc_str = _WS_RE.sub(" ", str(exc))
+    logger.error("%s: %s", request, exc_str)
     content = {"status_code": 10422, "message": exc_str, "data": None}
-    return JSONResponse(
+    return ORJSONResponse(
         content=content, status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
     )
 
 
-@app.get("/health")
+@app.get("/health", response_model=None)
 async def health() -> dict[str, str]:
     """Health check endpoint."""
     return {"msg": "up & running"}
 
 
-@app.post("/message")
-def reply(
+async def _handle_audio(
+    background_tasks: BackgroundTasks,
+    From: str,
+    user_message: Optional[str],
+    media_url: Optional[str],
+    lat: Optional[float],
+    lon: Optional[float],
+) -> str:
+    """Transcribe a voice note and answer it as a text message."""
+    from ai import get_response
+    from audio_processor import audio_processor
+    
+    logger.info("Processing audio message from %s", From)
+    if not media_url:
+        background_tasks.add_task(send_message, From, "⚠️ No se pudo obtener el audio. Intenta de nuevo.")
+        return "failure"
+    
+    transcribed_text = await audio_processor.process_audio_message(media_url)
+    
+    if not transcribed_text:
+        background_tasks.add_task(send_message, From, "⚠️ No pude procesar el audio. Por favor, intenta enviarlo de nuevo o escribe tu mensaje.")
+        return "failure"
+    
+    # Enviar el acuse mientras se procesa el texto transcrito como mensaje normal
+    _, chat_response = await asyncio.gather(
+        send_message(From, f"🎤 Escuché: \"{transcribed_text}\"\n\nProcesando tu solicitud..."),
+        get_response(transcribed_text, phone=From),
+    )
+    
+    if chat_response:
+        background_tasks.add_task(send_message, From, chat_response)
+        return "success"
+    
+    background_tasks.add_task(send_message, From, "⚠️ Ocurrió un error procesando tu mensaje.")
+    return "failure"
+
+
+async def _handle_image(
+    background_tasks: BackgroundTasks,
+    From: str,
+    user_message: Optional[str],
+    media_url: Optional[str],
+    lat: Optional[float],
+    lon: Optional[float],
+) -> str:
+    """Identify the recyclable material in a photo."""
+    from ai import identify_image
+    
+    logger.info("Processing image from %s", From)
+    if not media_url:
+        return "failure"
+    
+    if not user_message:
+        user_message = "Analiza este material reciclable y dame precio"
+    
+    chat_response = await identify_image(user_message, media_url, phone=From)
+    
+    if chat_response:
+        background_tasks.add_task(send_message, From, chat_response)
+        return "success"
+    
+    background_tasks.add_task(send_message, From, "⚠️ Error al analizar la imagen. ¿Puedes intentar con otra foto más clara?")
+    return "failure"
+
+
+# Longer text messages are never parsed as star ratings
+RATING_MAX_LENGTH = 64
+
+
+def _record_rating(From: str, stars: int, user_message: str) -> Optional[str]:
+    """Rate the user's last transaction; returns the confirmation, or None without one (blocking file I/O)."""
+    user_transactions = transaction_system.get_user_transactions(From)
+    if not user_transactions:
+        return None
+    
+    last_txn = user_transactions[-1]
+    rating_system.submit_rating(
+        last_txn['transaction_id'],
+        From,
+        stars,
+        feedback=user_message if len(user_message) > 5 else None
+    )
+    rep = rating_system.get_user_reputation(From)
+    return _RATING_CONFIRM_TMPL.format_map({
+        'stars': stars,
+        'star_icons': '⭐' * stars,
+        'reward_level': rep['reward_level'].upper(),
+        'bonus_percentage': rep['bonus_percentage'],
+    })
+
+
+async def _handle_text(
+    background_tasks: BackgroundTasks,
+    From: str,
+    user_message: Optional[str],
+    media_url: Optional[str],
+    lat: Optional[float],
+    lon: Optional[float],
+) -> str:
+    """Answer a text message (or record a star rating)."""
+    if not user_message:
+        if not media_url:
+            logger.error("No message or media provided")
+        return "failure"
+    
+    logger.info("Replying to text message from %s", From)
+    
+    # Check if it's a rating response (ratings are short and never commands)
+    stars = None
+    if len(user_message) <= RATING_MAX_LENGTH and not user_message.startswith("/"):
+        stars = rating_system.parse_rating_response(user_message)
+    if stars:
+        response = await asyncio.to_thread(_record_rating, From, stars, user_message)
+        if response:
+            background_tasks.add_task(send_message, From, response)
+            return "success"
+    
+    # Get AI response
+    from ai import get_response
+    
+    chat_response = await get_response(user_message, phone=From)
+
+    if chat_response:
+        # Add geolocation context if available
+        if lat and lon:
+            logger.info("Location received: %s, %s", lat, lon)
+        
+        background_tasks.add_task(send_message, From, chat_response)
+        return "success"
+    
+    logger.error("Failed to get AI response")
+    background_tasks.add_task(send_message, From, "⚠️ Ocurrió un error temporal. ¿Puedes repetir tu consulta?")
+    return "failure"
+
+
+# Media kind -> handler; anything that is not audio or an image with a URL is handled as text
+_HANDLERS = {
+    "audio": _handle_audio,
+    "image": _handle_image,
+    "text": _handle_text,
+}
+
+
+# response_model=None: the str annotation would otherwise run a pydantic check per webhook.
+# The body stays a JSON string: a text/plain body would be sent back to the user by Twilio.
+@app.post("/message", response_model=None)
+async def reply(
+    background_tasks: BackgroundTasks,
     From: str = Form(),
     Body: Optional[str] = Form(None),
     MediaUrl0: Optional[str] = Form(None),
@@ -51,114 +287,33 @@ def reply(
     Latitude: Optional[str] = Form(None),
     Longitude: Optional[str] = Form(None),
 ) -> str:
-    """Reply to a WhatsApp message from the user."""
-    user_message = Body
-    media_url = MediaUrl0
-    media_type = MediaContentType0
-    
+    """Reply to a WhatsApp message from the user (replies go out after the webhook returns)."""
     # Extract geolocation if available
     lat = float(Latitude) if Latitude else None
     lon = float(Longitude) if Longitude else None
     
-    # ========== STEP 1: PROCESS AUDIO ==========
-    if media_type and 'audio' in media_type.lower():
-        logger.info(f"Processing audio message from {From}")
-        if not media_url:
-            send_message(From, "⚠️ No se pudo obtener el audio. Intenta de nuevo.")
-            return "failure"
-        
-        transcribed_text = audio_processor.process_audio_message(media_url)
-        
-        if transcribed_text:
-            send_message(From, f"🎤 Escuché: \"{transcribed_text}\"\n\nProcesando tu solicitud...")
-            # Procesar el texto transcrito como mensaje normal
-            chat_response = get_response(transcribed_text, phone=From)
-            
-            if chat_response:
-                send_message(From, chat_response)
-                return "success"
-            else:
-                send_message(From, "⚠️ Ocurrió un error procesando tu mensaje.")
-                return "failure"
-        else:
-            send_message(From, "⚠️ No pude procesar el audio. Por favor, intenta enviarlo de nuevo o escribe tu mensaje.")
-            return "failure"
+    # Twilio sends a MIME type ("audio/ogg", "image/jpeg"): a prefix check is enough
+    media_type = MediaContentType0.lower() if MediaContentType0 else ""
+    if media_type.startswith("audio/"):
+        kind = "audio"
+    elif media_type.startswith("image/") and MediaUrl0:
+        kind = "image"
+    else:
+        kind = "text"
     
-    # ========== STEP 2: PROCESS IMAGE ==========
-    if media_type and 'image' in media_type.lower() and media_url:
-        logger.info(f"Processing image from {From}")
-        
-        if not user_message:
-            user_message = "Analiza este material reciclable y dame precio"
-        
-        chat_response = identify_image(user_message, media_url, phone=From)
-        
-        if chat_response:
-            send_message(From, chat_response)
-            return "success"
-        else:
-            send_message(From, "⚠️ Error al analizar la imagen. ¿Puedes intentar con otra foto más clara?")
-            return "failure"
-    
-    # ========== STEP 3: PROCESS TEXT ==========
-    if not media_url and not user_message:
-        logger.error("No message or media provided")
-        return "failure"
-    
-    if user_message:
-        logger.info(f"Replying to text message from {From}")
-        
-        # Check if it's a rating response
-        stars = rating_system.parse_rating_response(user_message)
-        if stars:
-            user_transactions = transaction_system.get_user_transactions(From)
-            if user_transactions:
-                last_txn = user_transactions[-1]
-                rating_system.submit_rating(
-                    last_txn['transaction_id'],
-                    From,
-                    stars,
-                    feedback=user_message if len(user_message) > 5 else None
-                )
-                rep = rating_system.get_user_reputation(From)
-                response = f"""
-✅ ¡Gracias por tu calificación de {stars} {'⭐' * stars}!
-
-Tu nivel: *{rep['reward_level'].upper()}* 🏆
-Bonus en próximas ventas: *+{rep['bonus_percentage']}%*
-
-¿En qué más puedo ayudarte?
-""".strip()
-                send_message(From, response)
-                return "success"
-        
-        # Get AI response
-        chat_response = get_response(user_message, phone=From)
-
-        if chat_response:
-            # Add geolocation context if available
-            if lat and lon:
-                logger.info(f"Location received: {lat}, {lon}")
-            
-            send_message(From, chat_response)
-            return "success"
-        else:
-            logger.error("Failed to get AI response")
-            send_message(From, "⚠️ Ocurrió un error temporal. ¿Puedes repetir tu consulta?")
-            return "failure"
-    
-    return "failure"
+    return await _HANDLERS[kind](background_tasks, From, Body, MediaUrl0, lat, lon)
 
 
 # === TRANSACTION & QUOTATION ENDPOINTS ===
 
 @app.post("/create-quotation")
 async def create_quotation_endpoint(
+    background_tasks: BackgroundTasks,
     phone: str = Form(),
     material: str = Form(),
     estimated_kg: float = Form(),
     price_per_kg: float = Form()
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Create a quotation with unique code."""
     try:
         quotation = transaction_system.create_quotation(
@@ -168,49 +323,44 @@ async def create_quotation_endpoint(
             price_per_kg=price_per_kg
         )
         
-        message = f"""
-📋 *COTIZACIÓN GENERADA*
-
-Código: *{quotation['code']}*
-Material: {material}
-Cantidad estimada: {estimated_kg} kg
-Precio: S/ {price_per_kg}/kg
-Total estimado: S/ {quotation['total_estimated']}
-
-⏰ Válido hasta: {datetime.fromisoformat(quotation['expires_at']).strftime('%d/%m/%Y %H:%M')}
-
-📸 *Siguiente paso:*
-Envía una foto de tu material con el código {quotation['code']} visible para verificar.
-""".strip()
+        message = _QUOTATION_TMPL.format_map({
+            'code': quotation['code'],
+            'material': material,
+            'estimated_kg': estimated_kg,
+            'price_per_kg': price_per_kg,
+            'total_estimated': quotation['total_estimated'],
+            'expires_at': datetime.fromtimestamp(quotation['expires_at_ts']).strftime('%d/%m/%Y %H:%M'),
+        })
         
-        send_message(phone, message)
-        return JSONResponse(content=quotation, status_code=200)
+        background_tasks.add_task(send_message, phone, message)
+        return ORJSONResponse(content=quotation, status_code=200)
         
     except Exception as e:
-        logger.error(f"Error creating quotation: {str(e)}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        logger.error("Error creating quotation: %s", e)
+        return ORJSONResponse(content={"error": str(e)}, status_code=500)
 
 
 @app.get("/quotation/{code}")
-async def get_quotation(code: str) -> JSONResponse:
+async def get_quotation(code: str) -> ORJSONResponse:
     """Get quotation by code."""
     quotation = transaction_system.get_quotation_by_code(code)
     
     if not quotation:
-        return JSONResponse(content={"error": "Código no encontrado"}, status_code=404)
+        return ORJSONResponse(content={"error": "Código no encontrado"}, status_code=404)
     
-    return JSONResponse(content=quotation, status_code=200)
+    return ORJSONResponse(content=quotation, status_code=200)
 
 
 @app.post("/complete-transaction")
 async def complete_transaction_endpoint(
+    background_tasks: BackgroundTasks,
     code: str = Form(),
     actual_kg: float = Form(),
     payment_method: str = Form(),
     warehouse_id: str = Form(),
     final_photo_url: Optional[str] = Form(None),
     notes: Optional[str] = Form(None)
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Complete a transaction after weighing at warehouse."""
     try:
         transaction = transaction_system.complete_transaction(
@@ -224,7 +374,7 @@ async def complete_transaction_endpoint(
         
         quotation = transaction_system.get_quotation_by_code(code)
         if not quotation:
-            return JSONResponse(content={"error": "Cotización no encontrada"}, status_code=404)
+            return ORJSONResponse(content={"error": "Cotización no encontrada"}, status_code=404)
         
         phone: str = str(quotation.get('phone', ''))
         
@@ -240,14 +390,8 @@ async def complete_transaction_endpoint(
             buyer_price=buyer_price
         )
         
-        # Track metrics
-        duration_minutes = 0  # Initialize
-        created_at_str = quotation.get('created_at', '')
-        completed_at_str = transaction.get('completed_at', '')
-        if created_at_str and completed_at_str:
-            start_time = datetime.fromisoformat(str(created_at_str))
-            end_time = datetime.fromisoformat(str(completed_at_str))
-            duration_minutes = (end_time - start_time).total_seconds() / 60
+        # Track metrics (epoch timestamps stored on the transaction, no ISO reparse)
+        duration_minutes = (transaction['completed_at_ts'] - transaction['created_at_ts']) / 60
         
         # Update warehouse load
         warehouse_system.update_warehouse_load(warehouse_id, actual_kg)
@@ -257,46 +401,42 @@ async def complete_transaction_endpoint(
             metrics.track_transaction_time(duration_minutes)
         
         # Send confirmation and request rating
-        confirmation_msg = f"""
-✅ *TRANSACCIÓN COMPLETADA*
-
-ID: {transaction['transaction_id']}
-Material: {transaction['material']}
-Peso: {actual_kg} kg
-Total pagado: S/ {transaction['total_amount']}
-Método: {payment_method}
-
-📍 Bodega: {warehouse_id}
-⏱️ Tiempo total: {int(duration_minutes)} minutos
-""".strip()
+        confirmation_msg = _CONFIRMATION_TMPL.format_map({
+            'transaction_id': transaction['transaction_id'],
+            'material': transaction['material'],
+            'actual_kg': actual_kg,
+            'total_amount': transaction['total_amount'],
+            'payment_method': payment_method,
+            'warehouse_id': warehouse_id,
+            'duration_minutes': int(duration_minutes),
+        })
         
-        send_message(phone, confirmation_msg)
-        
-        # Request rating
+        # Request rating (one background job, so the rating prompt follows the confirmation)
         rating_msg = rating_system.request_rating(transaction['transaction_id'], phone)
-        send_message(phone, rating_msg)
+        background_tasks.add_task(send_messages, phone, confirmation_msg, rating_msg)
         
-        return JSONResponse(content={
+        return ORJSONResponse(content={
             'transaction': transaction,
             'commission': commission
         }, status_code=200)
         
     except Exception as e:
-        logger.error(f"Error completing transaction: {str(e)}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        logger.error("Error completing transaction: %s", e)
+        return ORJSONResponse(content={"error": str(e)}, status_code=500)
 
 
 # === WAREHOUSE & GEOLOCATION ENDPOINTS ===
 
 @app.post("/assign-warehouse")
 async def assign_warehouse_endpoint(
+    background_tasks: BackgroundTasks,
     phone: str = Form(),
     code: str = Form(),
     latitude: float = Form(),
     longitude: float = Form(),
     material: str = Form(),
     estimated_kg: float = Form()
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Assign nearest warehouse to user."""
     try:
         assignment = warehouse_system.assign_warehouse(
@@ -309,35 +449,19 @@ async def assign_warehouse_endpoint(
         )
         
         if not assignment:
-            return JSONResponse(
+            return ORJSONResponse(
                 content={"error": "No hay bodegas disponibles cerca"},
                 status_code=404
             )
         
-        message = f"""
-📍 *BODEGA ASIGNADA*
-
-🏪 {assignment['warehouse_name']}
-📌 {assignment['warehouse_address']}
-📞 {assignment['warehouse_phone']}
-
-📏 Distancia: {assignment['distance_km']} km
-⏰ Horario: {assignment['opening_hours']}
-
-*Instrucciones:*
-1. Muestra este mensaje al llegar
-2. Código de verificación: {code}
-3. Lleva tu material para pesaje
-
-¿Necesitas indicaciones para llegar?
-""".strip()
+        message = _ASSIGN_TMPL.format_map({**assignment, 'code': code})
         
-        send_message(phone, message)
-        return JSONResponse(content=assignment, status_code=200)
+        background_tasks.add_task(send_message, phone, message)
+        return ORJSONResponse(content=assignment, status_code=200)
         
     except Exception as e:
-        logger.error(f"Error assigning warehouse: {str(e)}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        logger.error("Error assigning warehouse: %s", e)
+        return ORJSONResponse(content={"error": str(e)}, status_code=500)
 
 
 @app.get("/warehouses/near")
@@ -346,7 +470,7 @@ async def get_nearby_warehouses(
     lon: float,
     material: str,
     max_distance: float = 5.0
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Find nearby warehouses."""
     warehouses = warehouse_system.find_nearest_warehouses(
         latitude=lat,
@@ -355,18 +479,19 @@ async def get_nearby_warehouses(
         max_distance_km=max_distance
     )
     
-    return JSONResponse(content=warehouses, status_code=200)
+    return ORJSONResponse(content=warehouses, status_code=200)
 
 
 # === RATING & FEEDBACK ENDPOINTS ===
 
 @app.post("/submit-rating")
 async def submit_rating_endpoint(
+    background_tasks: BackgroundTasks,
     transaction_id: str = Form(),
     phone: str = Form(),
     stars: int = Form(),
     feedback: Optional[str] = Form(None)
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Submit a rating for a transaction."""
     try:
         rating = rating_system.submit_rating(
@@ -378,37 +503,55 @@ async def submit_rating_endpoint(
         
         rep = rating_system.get_user_reputation(phone)
         
-        message = f"""
-✅ ¡Gracias por tu calificación!
-
-Tu nivel: *{rep['reward_level'].upper()}* 🏆
-Promedio: {rep['average_stars']} ⭐
-Bonus: +{rep['bonus_percentage']}% en próximas ventas
-
-Sigue así para desbloquear más beneficios!
-""".strip()
+        message = _RATING_THANKS_TMPL.format_map({
+            'reward_level': rep['reward_level'].upper(),
+            'average_stars': rep['average_stars'],
+            'bonus_percentage': rep['bonus_percentage'],
+        })
         
-        send_message(phone, message)
-        return JSONResponse(content=rating, status_code=200)
+        background_tasks.add_task(send_message, phone, message)
+        return ORJSONResponse(content=rating, status_code=200)
         
     except Exception as e:
-        logger.error(f"Error submitting rating: {str(e)}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        logger.error("Error submitting rating: %s", e)
+        return ORJSONResponse(content={"error": str(e)}, status_code=500)
 
 
 @app.get("/reputation/{phone}")
-async def get_reputation(phone: str) -> JSONResponse:
+async def get_reputation(phone: str) -> ORJSONResponse:
     """Get user reputation."""
     reputation = rating_system.get_user_reputation(phone)
-    return JSONResponse(content=reputation, status_code=200)
+    return ORJSONResponse(content=reputation, status_code=200)
 
 
 # === DASHBOARD & ANALYTICS ENDPOINTS ===
 
+# Dashboard snapshot shared by all pollers for DASHBOARD_TTL seconds
+DASHBOARD_TTL = 10
+_dashboard_cache: Tuple[float, Dict[str, Any]] = (float("-inf"), {})
+_dashboard_lock = asyncio.Lock()
+
+
 @app.get("/dashboard")
-async def get_dashboard() -> JSONResponse:
-    """Get comprehensive dashboard with all metrics."""
-    dashboard = {
+async def get_dashboard() -> ORJSONResponse:
+    """Get comprehensive dashboard with all metrics (cached for DASHBOARD_TTL seconds)."""
+    global _dashboard_cache
+    headers = {"Cache-Control": f"max-age={DASHBOARD_TTL}"}
+    
+    # Single flight: concurrent misses wait for one rebuild instead of each recomputing
+    async with _dashboard_lock:
+        built_at, dashboard = _dashboard_cache
+        if time.monotonic() - built_at < DASHBOARD_TTL:
+            return ORJSONResponse(content=dashboard, status_code=200, headers=headers)
+        
+        dashboard = _build_dashboard()
+        _dashboard_cache = (time.monotonic(), dashboard)
+    
+    return ORJSONResponse(content=dashboard, status_code=200, headers=headers)
+
+
+def _build_dashboard() -> Dict[str, Any]:
+    return {
         'business_metrics': metrics.get_dashboard_stats(),
         'kpis': metrics.get_kpis(),
         'transactions': transaction_system.get_statistics(),
@@ -417,19 +560,17 @@ async def get_dashboard() -> JSONResponse:
         'revenue': revenue_system.get_statistics(),
         'timestamp': datetime.now().isoformat()
     }
-    
-    return JSONResponse(content=dashboard, status_code=200)
 
 
 @app.get("/revenue/monthly/{year}/{month}")
-async def get_monthly_revenue(year: int, month: int) -> JSONResponse:
+async def get_monthly_revenue(year: int, month: int) -> ORJSONResponse:
     """Get monthly revenue breakdown."""
     revenue = revenue_system.get_monthly_revenue(year, month)
-    return JSONResponse(content=revenue, status_code=200)
+    return ORJSONResponse(content=revenue, status_code=200)
 
 
 @app.get("/transactions/user/{phone}")
-async def get_user_transactions(phone: str) -> JSONResponse:
+async def get_user_transactions(phone: str) -> ORJSONResponse:
     """Get all transactions for a user."""
     transactions = transaction_system.get_user_transactions(phone)
-    return JSONResponse(content=transactions, status_code=200)
+    return ORJSONResponse(content=transactions, status_code=200)
@@ -1,69 +1,192 @@
 """Conversational memory and quick responses for circular economy bot."""
 
-from typing import Any, Dict, List, Optional
+import heapq
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from types import MappingProxyType
+from typing import Any, Deque, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
+import orjson
+
+from env import REDIS_URL
+
+# Backend Redis opcional (poetry install -E redis)
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependencia opcional
+    redis = None
+
+# Mensajes guardados por usuario (los más antiguos se descartan solos)
+MAX_HISTORY = 20
+
 # Almacenamiento en memoria de conversaciones
-conversation_history: Dict[str, List[Dict[str, str]]] = {}
+conversation_history: Dict[str, Deque[Dict[str, str]]] = {}
 user_profiles: Dict[str, Dict[str, Any]] = {}
 
 # Tiempo de expiración de memoria (30 minutos)
 MEMORY_EXPIRATION = timedelta(minutes=30)
 last_interaction: Dict[str, datetime] = {}
+# (expira, phone) por cada interacción; las entradas viejas de un usuario activo se descartan al salir
+_expiry_heap: List[Tuple[datetime, str]] = []
+
+# Puntajes de tipo de usuario [proveedor, comprador] sobre el historial guardado, actualizados al agregar
+user_type_scores: Dict[str, List[int]] = {}
+
+# Locks por usuario, repartidos en LOCK_STRIPES (memoria acotada con muchos usuarios);
+# el heap de expiración es compartido y tiene su propio lock
+LOCK_STRIPES = 64
+_user_locks = tuple(threading.RLock() for _ in range(LOCK_STRIPES))
+_heap_lock = threading.Lock()
+
+
+def _lock_for(phone: str) -> threading.RLock:
+    return _user_locks[hash(phone) & (LOCK_STRIPES - 1)]
+
+
+# Con REDIS_URL, historial y perfiles viven en Redis (compartidos entre workers) y expiran
+# por TTL nativo; sin Redis se usan los diccionarios en proceso de arriba
+_redis = redis.Redis.from_url(REDIS_URL, max_connections=50, decode_responses=True) if redis and REDIS_URL else None
+_EXPIRE_SECONDS = int(MEMORY_EXPIRATION.total_seconds())
+
+
+def _history_key(phone: str) -> str:
+    return f"memory:history:{phone}"
+
+
+def _profile_key(phone: str) -> str:
+    return f"memory:profile:{phone}"
+
+
+def _interests_key(phone: str) -> str:
+    return f"memory:interests:{phone}"
+
+
+# Campos del hash de perfil con los puntajes de tipo de usuario (internos, no se devuelven)
+_SCORE_FIELDS = ("provider_score", "buyer_score")
+
+
+# Keywords para proveedores y compradores, buscados en una sola pasada
+PROVIDER_KEYWORDS = ("vender", "tengo", "ofrezco", "recolecto", "reciclador",
+                     "material", "stock", "disponible", "vendo")
+BUYER_KEYWORDS = ("comprar", "necesito", "busco", "empresa", "fábrica",
+                  "producción", "requiero", "compro")
+_PROVIDER_SET = frozenset(PROVIDER_KEYWORDS)
+# Lookahead: prueba cada posición, así se cuentan también coincidencias solapadas
+_USER_TYPE_RE = re.compile("(?=(" + "|".join(map(re.escape, PROVIDER_KEYWORDS + BUYER_KEYWORDS)) + "))")
 
 
 def clean_expired_memories():
     """Remove expired conversation memories."""
+    if _redis is not None:
+        return  # Redis expira las claves solo
+    
     now = datetime.now()
-    expired_users = [
-        user for user, last_time in last_interaction.items()
-        if now - last_time > MEMORY_EXPIRATION
-    ]
-    for user in expired_users:
-        conversation_history.pop(user, None)
-        user_profiles.pop(user, None)
-        last_interaction.pop(user, None)
+    while True:
+        with _heap_lock:
+            if not _expiry_heap or _expiry_heap[0][0] >= now:
+                return
+            _, user = heapq.heappop(_expiry_heap)
+        
+        with _lock_for(user):
+            last_time = last_interaction.get(user)
+            if last_time is None or now - last_time <= MEMORY_EXPIRATION:
+                continue  # Ya eliminado, o volvió a escribir después de esta entrada
+            conversation_history.pop(user, None)
+            user_profiles.pop(user, None)
+            last_interaction.pop(user, None)
+            user_type_scores.pop(user, None)
 
 
 def get_user_history(phone: str, max_messages: int = 10) -> List[Dict[str, str]]:
     """Get conversation history for user."""
+    if _redis is not None:
+        if max_messages <= 0:
+            return []
+        return [orjson.loads(item) for item in _redis.lrange(_history_key(phone), -max_messages, -1)]
+    
     clean_expired_memories()
-    return conversation_history.get(phone, [])[-max_messages:]
+    with _lock_for(phone):
+        history = conversation_history.get(phone)
+        if not history:
+            return []
+        return list(islice(history, max(len(history) - max_messages, 0), None))
 
 
 def add_to_history(phone: str, role: str, content: str):
     """Add message to conversation history."""
-    if phone not in conversation_history:
-        conversation_history[phone] = []
-    
-    conversation_history[phone].append({
-        "role": role,
-        "content": content,
-        "timestamp": datetime.now().isoformat()
-    })
+    if _redis is not None:
+        message = {"role": role, "content": content, "timestamp": datetime.now().isoformat()}
+        key = _history_key(phone)
+        profile_key = _profile_key(phone)
+        # Una transacción: agregar, leer lo que sale del recorte a MAX_HISTORY, recortar,
+        # sumar los puntajes del mensaje al perfil y renovar el TTL del usuario
+        pipe = _redis.pipeline()
+        pipe.rpush(key, orjson.dumps(message))
+        pipe.lrange(key, 0, -MAX_HISTORY - 1)
+        pipe.ltrim(key, -MAX_HISTORY, -1)
+        for field, score in zip(_SCORE_FIELDS, _type_scores(content)):
+            pipe.hincrby(profile_key, field, score)
+        pipe.expire(key, _EXPIRE_SECONDS)
+        pipe.expire(profile_key, _EXPIRE_SECONDS)
+        pipe.expire(_interests_key(phone), _EXPIRE_SECONDS)
+        evicted = pipe.execute()[1]
+        
+        # Solo con el historial lleno: restar los mensajes descartados (cada uno sale una sola vez)
+        if evicted:
+            removed = [0, 0]
+            for item in evicted:
+                provider_score, buyer_score = _type_scores(orjson.loads(item)["content"])
+                removed[0] += provider_score
+                removed[1] += buyer_score
+            pipe = _redis.pipeline()
+            for field, score in zip(_SCORE_FIELDS, removed):
+                pipe.hincrby(profile_key, field, -score)
+            pipe.execute()
+        return
     
-    last_interaction[phone] = datetime.now()
+    with _lock_for(phone):
+        history = conversation_history.get(phone)
+        if history is None:
+            history = conversation_history[phone] = deque(maxlen=MAX_HISTORY)
+            user_type_scores[phone] = [0, 0]
+        
+        # Limitar a últimos MAX_HISTORY mensajes: el deque descarta el más antiguo al agregar
+        if len(history) == MAX_HISTORY:
+            _add_type_scores(phone, history[0]["content"], -1)
+        _add_type_scores(phone, content, 1)
+        
+        now = datetime.now()
+        history.append({
+            "role": role,
+            "content": content,
+            "timestamp": now.isoformat()
+        })
+        
+        last_interaction[phone] = now
     
-    # Limitar a últimos 20 mensajes
-    if len(conversation_history[phone]) > 20:
-        conversation_history[phone] = conversation_history[phone][-20:]
+    with _heap_lock:
+        heapq.heappush(_expiry_heap, (now + MEMORY_EXPIRATION, phone))
 
 
-def detect_user_type(message_history: List[Dict[str, str]]) -> str:
-    """Detect if user is provider or buyer based on conversation."""
-    all_text = " ".join([m["content"].lower() for m in message_history])
-    
-    # Keywords para proveedores
-    provider_keywords = ["vender", "tengo", "ofrezco", "recolecto", "reciclador", 
-                        "material", "stock", "disponible", "vendo"]
-    
-    # Keywords para compradores
-    buyer_keywords = ["comprar", "necesito", "busco", "empresa", "fábrica",
-                     "producción", "requiero", "compro"]
-    
-    provider_score = sum(1 for kw in provider_keywords if kw in all_text)
-    buyer_score = sum(1 for kw in buyer_keywords if kw in all_text)
-    
+def _type_scores(text: str) -> List[int]:
+    """[proveedor, comprador] para un texto: una pasada, cada aparición suma."""
+    found = _USER_TYPE_RE.findall(text.lower())
+    provider_score = sum(1 for kw in found if kw in _PROVIDER_SET)
+    return [provider_score, len(found) - provider_score]
+
+
+def _add_type_scores(phone: str, content: str, sign: int):
+    scores = user_type_scores[phone]
+    provider_score, buyer_score = _type_scores(content)
+    scores[0] += sign * provider_score
+    scores[1] += sign * buyer_score
+
+
+def _classify(provider_score: int, buyer_score: int) -> str:
     if provider_score > buyer_score:
         return "provider"
     elif buyer_score > provider_score:
@@ -71,33 +194,73 @@ def detect_user_type(message_history: List[Dict[str, str]]) -> str:
     return "unknown"
 
 
+def detect_user_type(message_history: List[Dict[str, str]]) -> str:
+    """Detect if user is provider or buyer based on conversation."""
+    return _classify(*_type_scores(" ".join([m["content"] for m in message_history])))
+
+
+def get_user_type(phone: str) -> str:
+    """detect_user_type over the stored history, from counters kept by add_to_history (O(1))."""
+    if _redis is not None:
+        return _classify(*(int(score or 0) for score in _redis.hmget(_profile_key(phone), *_SCORE_FIELDS)))
+    return _classify(*user_type_scores.get(phone, (0, 0)))
+
+
 def update_user_profile(phone: str, user_type: Optional[str] = None, interests: Optional[List[str]] = None):
     """Update user profile."""
-    if phone not in user_profiles:
-        user_profiles[phone] = {
-            "type": "unknown",
-            "interests": [],
-            "created": datetime.now().isoformat()
-        }
+    if _redis is not None:
+        now = datetime.now().isoformat()
+        key = _profile_key(phone)
+        pipe = _redis.pipeline()
+        pipe.hsetnx(key, "type", "unknown")
+        pipe.hsetnx(key, "created", now)
+        if user_type:
+            pipe.hset(key, "type", user_type)
+        pipe.hset(key, "last_updated", now)
+        pipe.expire(key, _EXPIRE_SECONDS)
+        if interests:
+            pipe.sadd(_interests_key(phone), *interests)
+            pipe.expire(_interests_key(phone), _EXPIRE_SECONDS)
+        pipe.execute()
+        return
     
-    if user_type:
-        user_profiles[phone]["type"] = user_type
-    
-    if interests:
-        existing = set(user_profiles[phone]["interests"])
-        existing.update(interests)
-        user_profiles[phone]["interests"] = list(existing)
-    
-    user_profiles[phone]["last_updated"] = datetime.now().isoformat()
+    with _lock_for(phone):
+        if phone not in user_profiles:
+            user_profiles[phone] = {
+                "type": "unknown",
+                "interests": [],
+                "created": datetime.now().isoformat()
+            }
+        
+        if user_type:
+            user_profiles[phone]["type"] = user_type
+        
+        if interests:
+            existing = set(user_profiles[phone]["interests"])
+            existing.update(interests)
+            user_profiles[phone]["interests"] = list(existing)
+        
+        user_profiles[phone]["last_updated"] = datetime.now().isoformat()
 
 
 def get_user_profile(phone: str) -> Dict[str, Any]:
     """Get user profile."""
+    if _redis is not None:
+        pipe = _redis.pipeline()
+        pipe.hgetall(_profile_key(phone))
+        pipe.smembers(_interests_key(phone))
+        profile, interests = pipe.execute()
+        for field in _SCORE_FIELDS:
+            profile.pop(field, None)
+        if not profile:
+            return {"type": "unknown", "interests": []}
+        return {**profile, "interests": list(interests)}
+    
     return user_profiles.get(phone, {"type": "unknown", "interests": []})
 
 
 # Respuestas predefinidas instantáneas
-QUICK_RESPONSES = {
+_QUICK_RESPONSES_RAW = {
     "hola": """¡Hola! 👋 Bienvenido a nuestra plataforma de economía circular.
 
 Conectamos proveedores de materiales reciclables con empresas compradoras, eliminando intermediarios y promoviendo sostenibilidad 🌱
@@ -259,7 +422,7 @@ También puedes usar comandos:
 }
 
 # Comandos especiales
-SPECIAL_COMMANDS = {
+_SPECIAL_COMMANDS_RAW = {
     "/menu": "menu",
     "/catalogo": "catalogo",
     "/precios": "precios",
@@ -270,18 +433,28 @@ SPECIAL_COMMANDS = {
     "/beneficios": "beneficios",
 }
 
+# Solo lectura; las claves ya están en minúsculas
+QUICK_RESPONSES = MappingProxyType(_QUICK_RESPONSES_RAW)
+SPECIAL_COMMANDS = MappingProxyType(_SPECIAL_COMMANDS_RAW)
+
+# Palabras clave de respuestas rápidas en una sola alternancia; gana la más larga (más específica)
+_QUICK_PRIORITY = {keyword: (-len(keyword), index) for index, keyword in enumerate(QUICK_RESPONSES)}
+_QUICK_RE = re.compile("(?=(" + "|".join(map(re.escape, QUICK_RESPONSES)) + "))")
+
 
 def get_quick_response(message: str) -> str | None:
     """Get predefined quick response if applicable."""
-    msg_lower = message.lower().strip()
-    
+    return _quick_response_for(message.lower().strip())
+
+
+@lru_cache(maxsize=2048)
+def _quick_response_for(msg_lower: str) -> str | None:
     # Check special commands first
     if msg_lower in SPECIAL_COMMANDS:
         return QUICK_RESPONSES.get(SPECIAL_COMMANDS[msg_lower])
     
-    # Check for keywords in message
-    for keyword, response in QUICK_RESPONSES.items():
-        if keyword in msg_lower:
-            return response
-    
-    return None
+    # Check for keywords in message (one scan, dict order breaks ties)
+    found = _QUICK_RE.findall(msg_lower)
+    if not found:
+        return None
+    return QUICK_RESPONSES[min(found, key=_QUICK_PRIORITY.__getitem__)]
@@ -1,6 +1,8 @@
 """Quick responses for common queries - Circular Economy Bot."""
 
-QUICK_RESPONSES = {
+from types import MappingProxyType
+
+_QUICK_RESPONSES_RAW = {
     # Saludos y bienvenida
     "hola": """¡Hola! 👋 Soy tu asistente de economía circular.
 
@@ -225,6 +227,12 @@ Envía foto 📸 o describe""",
 ¿Quieres ser parte?""",
 }
 
+# Solo lectura; las claves ya están en minúsculas
+QUICK_RESPONSES = MappingProxyType(_QUICK_RESPONSES_RAW)
+
+# Coincidencias parciales: la clave más larga (más específica) gana
+_QUICK_KEYWORDS_BY_LEN = tuple(sorted(QUICK_RESPONSES, key=len, reverse=True))
+
 
 def get_quick_response(user_message: str) -> str | None:
     """Check if message matches a quick response."""
@@ -235,15 +243,15 @@ def get_quick_response(user_message: str) -> str | None:
         return QUICK_RESPONSES[msg_lower]
     
     # Partial matches
-    for key, response in QUICK_RESPONSES.items():
+    for key in _QUICK_KEYWORDS_BY_LEN:
         if key in msg_lower:
-            return response
+            return QUICK_RESPONSES[key]
     
     return None
 
 
 # Comandos especiales (empiezan con /)
-SPECIAL_COMMANDS = {
+SPECIAL_COMMANDS = MappingProxyType({
     "/menu": lambda: QUICK_RESPONSES["menu"],
     "/ayuda": lambda: QUICK_RESPONSES["menu"],
     "/help": lambda: QUICK_RESPONSES["menu"],
@@ -252,7 +260,7 @@ SPECIAL_COMMANDS = {
     "/contacto": lambda: QUICK_RESPONSES["contacto"],
     "/logros": lambda: QUICK_RESPONSES["logros"],
     "/beneficios": lambda: QUICK_RESPONSES["beneficios"],
-}
+})
 
 
 def handle_special_command(message: str) -> str | None:
@@ -1,10 +1,16 @@
 """Sistema de ratings, feedback y reputación de usuarios."""
 
 import json
+import re
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+# Respuesta que es solo la calificación: "5", "4 ⭐", "3 estrellas"
+_RATING_RE = re.compile(r'^\s*(?P<stars>[1-5])\s*(?:⭐+|estrellas?)?\s*[.!]*\s*$', re.IGNORECASE)
+# Calificación dentro de una frase, solo si va con estrellas o "le doy N": "5 estrellas, excelente"
+_RATING_PHRASE_RE = re.compile(r'\b(?P<stars>[1-5])\s*(?:⭐|estrellas?\b)|\ble\s+doy\s+(?:un\s+)?(?P<given>[1-5])\b', re.IGNORECASE)
+
 
 class RatingSystem:
     """Gestiona ratings, feedback y sistema de reputación."""
@@ -195,15 +201,18 @@ Responde con el número de estrellas (1-5)
         Returns:
             Número de estrellas (1-5) o None si no es válido
         """
-        # Buscar número del 1 al 5
-        for char in message:
-            if char.isdigit():
-                stars = int(char)
-                if 1 <= stars <= 5:
-                    return stars
-        
-        # Contar estrellas (⭐)
-        star_count = message.count('⭐') or message.count('*')
+        # Número del 1 al 5 como respuesta completa o junto a "estrellas"; "3 toneladas" no es un rating
+        match = _RATING_RE.match(message)
+        if match:
+            return int(match.group('stars'))
+        match = _RATING_PHRASE_RE.search(message)
+        if match:
+            return int(match.group('stars') or match.group('given'))
+        
+        # Contar estrellas (⭐), o asteriscos si el mensaje es solo eso
+        star_count = message.count('⭐')
+        if not star_count and message.strip().strip('*') == '':
+            star_count = message.count('*')
         if 1 <= star_count <= 5:
             return star_count
         
@@ -0,0 +1,74 @@
+"""Tests for the SQLite-backed BusinessMetrics store."""
+
+from pathlib import Path
+
+import orjson
+
+from business_metrics import BusinessMetrics
+
+
+def test_first_run_migrates_legacy_json(tmp_path: Path) -> None:
+    """Without a database, the old JSON files are loaded and written to SQLite."""
+    (tmp_path / "business_metrics.json").write_bytes(orjson.dumps({
+        "total_messages": 14,
+        "materials_consulted": {"PET": 1},
+        "intents_detected": {"comprar": 3, "vender": 2},
+        "hot_leads": ["+51911"],
+        "conversion_funnel": {"inquiry": 4, "negotiation": 1, "closed": 0},
+        "response_times": [1.5, 2.5],
+        "transaction_times": [],
+    }))
+    (tmp_path / "leads.json").write_bytes(orjson.dumps([{
+        "phone": "+51911",
+        "user_type": "buyer",
+        "materials": ["PET"],
+        "quantity": {"value": 2.0, "unit": "toneladas"},
+        "is_hot": True,
+        "timestamp": "2024-01-01T00:00:00",
+        "status": "new",
+    }]))
+
+    migrated = BusinessMetrics(str(tmp_path))
+    migrated.close()
+
+    reloaded = BusinessMetrics(str(tmp_path))
+    try:
+        assert reloaded.metrics["total_messages"] == 14
+        assert reloaded.metrics["materials_consulted"] == {"PET": 1}
+        assert reloaded.metrics["intents_detected"] == {"comprar": 3, "vender": 2}
+        assert reloaded.metrics["conversion_funnel"] == {"inquiry": 4, "negotiation": 1, "closed": 0}
+        assert list(reloaded.metrics["response_times"]) == [1.5, 2.5]
+        assert reloaded.metrics["hot_leads"] == ["+51911"]
+        assert reloaded.leads == migrated.leads
+    finally:
+        reloaded.close()
+
+
+def test_flush_round_trip(tmp_path: Path) -> None:
+    """Everything tracked before a flush is read back by a new instance."""
+    store = BusinessMetrics(str(tmp_path))
+    store.track_conversation_start("+51922", "provider")
+    store.track_message("+51922", "provider", ["vender"])
+    store.track_material_inquiry("+51922", ["cobre"])
+    store.track_lead("+51922", "provider", ["cobre"], {"value": 50.0, "unit": "kg"}, is_hot=True)
+    store.track_negotiation("+51922")
+    store.track_close("+51922")
+    store.track_response_time(0.8)
+    store.flush()
+    expected_leads = [dict(lead) for lead in store.leads]
+    store.close()
+
+    reloaded = BusinessMetrics(str(tmp_path))
+    try:
+        assert reloaded.metrics["total_conversations"] == 1
+        assert reloaded.metrics["providers_count"] == 1
+        assert reloaded.metrics["total_messages"] == 1
+        assert reloaded.metrics["intents_detected"] == {"vender": 1}
+        assert reloaded.metrics["materials_consulted"] == {"cobre": 1}
+        assert reloaded.metrics["conversion_funnel"] == {"inquiry": 1, "negotiation": 1, "closed": 1}
+        assert list(reloaded.metrics["response_times"]) == [0.8]
+        assert reloaded.metrics["hot_leads"] == ["+51922"]
+        assert reloaded.leads == expected_leads
+        assert reloaded.leads[0]["status"] == "closed"
+    finally:
+        reloaded.close()
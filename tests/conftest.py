@@ -0,0 +1,14 @@
+"""Shared pytest setup."""
+
+import os
+
+# env.py refuses to import without these; tests never reach Twilio or OpenAI
+for _name in (
+    "PROJECT_NAME",
+    "TWILIO_ACCOUNT_SID",
+    "TWILIO_AUTH_TOKEN",
+    "TWILIO_NUMBER",
+    "TWILIO_MESSAGING_SERVICE_SID",
+    "OPENAI_API_KEY",
+):
+    os.environ.setdefault(_name, "test")
@@ -0,0 +1,32 @@
+"""Tests for quantity extraction in the intent detector."""
+
+import pytest
+
+from intent_detector import extract_quantities
+
+
+@pytest.mark.parametrize(
+    ("message", "value", "unit"),
+    [
+        ("tengo 50 kg de pet", 50.0, "kg"),
+        ("500 kgs de cobre", 500.0, "kg"),
+        ("20 kilos de cartón", 20.0, "kg"),
+        ("1 kilogramo", 1.0, "kg"),
+        ("3 toneladas de papel", 3.0, "toneladas"),
+        ("2 tons de papel", 2.0, "toneladas"),
+        ("10 tn", 10.0, "toneladas"),
+        ("2 t de vidrio", 2.0, "toneladas"),
+        ("300 grs", 300.0, "gramos"),
+        ("500g", 500.0, "gramos"),
+        ("medio kilo de cobre", 0.5, "kg"),
+    ],
+)
+def test_unit_forms(message: str, value: float, unit: str) -> None:
+    """Singular, plural and short unit spellings are all recognized."""
+    quantities = extract_quantities(message)
+    assert [(q["value"], q["unit"]) for q in quantities] == [(value, unit)]
+
+
+def test_unit_needs_word_boundary() -> None:
+    """A number followed by a word starting with a unit letter is not a quantity."""
+    assert extract_quantities("quiero 5 tapas y 3 garrafas") == []
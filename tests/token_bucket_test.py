@@ -0,0 +1,51 @@
+"""Tests for the RPM/TPM token bucket in ai_batch."""
+
+import asyncio
+import time
+
+from ai_batch import TokenBucket
+
+
+def test_acquire_within_capacity_does_not_wait() -> None:
+    """A full bucket hands out its capacity immediately."""
+    async def run() -> float:
+        bucket = TokenBucket(per_minute=600)
+        start = time.monotonic()
+        await bucket.acquire(600)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) < 0.05
+
+
+def test_acquire_waits_for_refill() -> None:
+    """An empty bucket waits until enough units have been refilled."""
+    async def run() -> float:
+        bucket = TokenBucket(per_minute=600)  # 10 units per second
+        await bucket.acquire(600)
+        start = time.monotonic()
+        await bucket.acquire(2)
+        return time.monotonic() - start
+
+    assert 0.15 <= asyncio.run(run()) < 0.5
+
+
+def test_cost_above_capacity_is_capped() -> None:
+    """A request larger than the bucket is charged at capacity instead of waiting forever."""
+    async def run() -> float:
+        bucket = TokenBucket(per_minute=600)
+        await bucket.acquire(10_000)
+        return bucket.available
+
+    assert asyncio.run(run()) < 1
+
+
+def test_concurrent_waiters_are_served_in_turn() -> None:
+    """Waiters share the refill instead of all proceeding at once."""
+    async def run() -> float:
+        bucket = TokenBucket(per_minute=600)
+        await bucket.acquire(600)
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire(1) for _ in range(3)))
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.25
@@ -3,11 +3,20 @@
 import json
 import random
 import string
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 
+def _timestamp(record: Dict[str, Any], key: str) -> float:
+    """Epoch de `key`; los registros antiguos solo tienen la fecha ISO."""
+    ts = record.get(f"{key}_ts")
+    if ts is None:
+        ts = datetime.fromisoformat(record[key]).timestamp()
+    return ts
+
+
 class TransactionSystem:
     """Gestiona transacciones con códigos únicos, precios con expiración y verificación."""
     
@@ -86,6 +95,8 @@ class TransactionSystem:
             'total_estimated': round(estimated_kg * price_per_kg, 2),
             'created_at': now.isoformat(),
             'expires_at': expiration.isoformat(),
+            'created_at_ts': now.timestamp(),  # Epoch para cálculos; las ISO son para mostrar
+            'expires_at_ts': expiration.timestamp(),
             'status': 'pending',  # pending, photo_uploaded, completed, expired, cancelled
             'photo_url': None,
             'verified': False
@@ -107,9 +118,8 @@ class TransactionSystem:
             return False, "Código no existe"
         
         quotation = self.active_codes[code]
-        expiration = datetime.fromisoformat(quotation['expires_at'])
         
-        if datetime.now() > expiration:
+        if time.time() > _timestamp(quotation, 'expires_at'):
             quotation['status'] = 'expired'
             self._save_codes()
             return False, "Código expirado (válido 24h)"
@@ -170,8 +180,9 @@ class TransactionSystem:
         weight_difference_percent = round((weight_difference / quotation['estimated_kg']) * 100, 2)
         
         # Crear transacción completa
+        now = datetime.now()
         transaction = {
-            'transaction_id': f"TXN-{datetime.now().strftime('%Y%m%d%H%M%S')}-{code[1:4]}",
+            'transaction_id': f"TXN-{now.strftime('%Y%m%d%H%M%S')}-{code[1:4]}",
             'code': code,
             'phone': quotation['phone'],
             'material': quotation['material'],
@@ -186,7 +197,9 @@ class TransactionSystem:
             'initial_photo_url': quotation.get('photo_url'),
             'final_photo_url': final_photo_url,
             'created_at': quotation['created_at'],
-            'completed_at': datetime.now().isoformat(),
+            'completed_at': now.isoformat(),
+            'created_at_ts': _timestamp(quotation, 'created_at'),
+            'completed_at_ts': now.timestamp(),
             'notes': notes,
             'status': 'completed'
         }
@@ -220,22 +233,20 @@ class TransactionSystem:
     
     def clean_expired_codes(self) -> int:
         """Limpia códigos expirados y retorna cantidad eliminada."""
-        now = datetime.now()
+        now = time.time()
         expired_count = 0
         
         codes_to_remove: List[str] = []
         for code, quotation in self.active_codes.items():
-            expiration = datetime.fromisoformat(quotation['expires_at'])
-            if now > expiration and quotation['status'] == 'pending':
+            if now > _timestamp(quotation, 'expires_at') and quotation['status'] == 'pending':
                 quotation['status'] = 'expired'
                 codes_to_remove.append(code)
                 expired_count += 1
         
         # Remover códigos expirados muy antiguos (más de 7 días)
-        cutoff = now - timedelta(days=7)
+        cutoff = now - timedelta(days=7).total_seconds()
         for code in codes_to_remove:
-            expiration = datetime.fromisoformat(self.active_codes[code]['expires_at'])
-            if expiration < cutoff:
+            if _timestamp(self.active_codes[code], 'expires_at') < cutoff:
                 del self.active_codes[code]
         
         self._save_codes()
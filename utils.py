@@ -1,6 +1,18 @@
 import logging
 
+import xxhash
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
 logger = logging.getLogger(__name__)
+
+
+def normalize_message(message: str) -> str:
+    """Normalize a user message once per request (trim + casefold) for lookups and keys."""
+    return message.strip().casefold()
+
+
+def text_digest(text: str) -> str:
+    """Non-cryptographic 128-bit hex digest (xxh3) for cache/dedup keys."""
+    return xxhash.xxh3_128_hexdigest(text.encode())
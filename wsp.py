@@ -5,17 +5,49 @@ from base64 import b64encode
 from json import dumps
 from typing import Dict
 
+import httpx
 import requests
-from twilio.rest import Client  # pyright: ignore [reportMissingTypeStubs]
 
 from env import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_NUMBER
 
-client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-
 logger = logging.getLogger(__name__)
 
+TWILIO_MESSAGES_URL = f"https://api.twilio.com/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json"
+
+# Basic Auth header for Twilio media requests, computed once at import
+_TWILIO_AUTH_HEADER = {
+    "Authorization": "Basic " + b64encode(f"{TWILIO_ACCOUNT_SID}:{TWILIO_AUTH_TOKEN}".encode("utf-8")).decode("utf-8")
+}
+
+# Shared Twilio client (outbound messages and media downloads): keep-alive + HTTP/2
+# reuse one TLS connection instead of a handshake per call
+twilio_http = httpx.AsyncClient(
+    http2=True,
+    auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
+    timeout=30.0,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+)
+
+
+async def aclose_http() -> None:
+    """Close the shared Twilio client (called on application shutdown)."""
+    await twilio_http.aclose()
+
+
+async def _create_message(to_number: str, fields: Dict[str, str]) -> None:
+    """POST a message to the Twilio Messages API, logging instead of raising."""
+    try:
+        response = await twilio_http.post(
+            TWILIO_MESSAGES_URL,
+            data={"From": f"whatsapp:{TWILIO_NUMBER}", "To": to_number, **fields},
+        )
+        response.raise_for_status()
+        logger.info("Message sent to %s: %s", to_number, response.json().get("body"))
+    except Exception:
+        logger.exception("Error sending message to %s", to_number)
+
 
-def send_message(to_number: str, body_text: str) -> None:
+async def send_message(to_number: str, body_text: str) -> None:
     """Send a message to a phone number using Twilio API."""
     # Remove whatsapp: prefix if present to normalize
     if to_number.startswith("whatsapp:"):
@@ -28,18 +60,17 @@ def send_message(to_number: str, body_text: str) -> None:
     # Add whatsapp: prefix
     to_number = f"whatsapp:{to_number}"
 
-    try:
-        message = client.messages.create(
-            from_=f"whatsapp:{TWILIO_NUMBER}",
-            body=body_text,
-            to=to_number,
-        )
-        logger.info("Message sent to %s: %s", to_number, message.body)
-    except Exception:
-        logger.exception("Error sending message to %s", to_number)
+    await _create_message(to_number, {"Body": body_text})
+
 
+async def send_messages(to_number: str, *bodies: str) -> None:
+    """Send several messages to one number in order, as a single background job."""
+    # Sequential on purpose: concurrent posts to the same chat may be delivered out of order
+    for body_text in bodies:
+        await send_message(to_number, body_text)
 
-def send_template_message(
+
+async def send_template_message(
     to_number: str,
     template_sid: str,
     content_variables: Dict[str, str],
@@ -49,25 +80,15 @@ def send_template_message(
     if not to_number.startswith("whatsapp:"):
         to_number = f"whatsapp:{to_number}"
 
-    try:
-        message = client.messages.create(
-            from_=f"whatsapp:{TWILIO_NUMBER}",
-            to=to_number,
-            content_variables=dumps(content_variables),
-            content_sid=template_sid,
-            messaging_service_sid=messaging_service_sid,
-        )
-        logger.info("Message sent to %s: %s", to_number, message.body)
-    except Exception:
-        logger.exception("Error sending message to %s", to_number)
+    await _create_message(to_number, {
+        "ContentSid": template_sid,
+        "ContentVariables": dumps(content_variables),
+        "MessagingServiceSid": messaging_service_sid,
+    })
 
 
 # get the media url with secure http
 def get_media_url(secure_media_url: str) -> str:
     """Get the media url with secure http."""
-    auth_str = f"{TWILIO_ACCOUNT_SID}:{TWILIO_AUTH_TOKEN}"
-    auth_bytes = auth_str.encode("utf-8")
-    auth_b64 = b64encode(auth_bytes).decode("utf-8")
-    headers = {"Authorization": "Basic " + auth_b64}
-    response = requests.get(secure_media_url, headers=headers, timeout=10)  # type: ignore[misc]
+    response = requests.get(secure_media_url, headers=_TWILIO_AUTH_HEADER, timeout=10)  # type: ignore[misc]
     return response.url  # type: ignore[return-value]